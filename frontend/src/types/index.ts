@@ -72,6 +72,7 @@ export interface ActivityListResponse {
   activities: Activity[];
   total: number;
   has_more: boolean;
+  next_cursor?: string | null;
 }
 
 export interface Device {
@@ -1,13 +1,13 @@
 """
 Activity logging middleware and utilities for tracking API activities.
 """
-from fastapi import Request, Response
+from fastapi import Request
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional, Any
 
 from .models import Activity, SessionLocal, Token, MasterToken
-from .auth import hash_token
+from .auth import hash_token, is_device_token
 from .exposure_detector import check_for_exposed_data, ExposureReport
 from .confidential_tracker import check_exposure_from_metadata
 
@@ -296,8 +296,8 @@ def get_token_type(request, db: Session) -> str:
         return 'project'
     
     # Check if it's a device_token (64 hex characters - SHA256 hash of device_id)
-    if len(token_str) == 64 and all(c in '0123456789abcdef' for c in token_str.lower()):
-        device = db.query(Device).filter(
+    if is_device_token(token_str):
+        device = db.query(Device.id).filter(
             Device.device_id_hash == token_str.lower(),  # DB column name, but conceptually it's device_token
             Device.status == "authorized"
         ).first()
@@ -310,11 +310,19 @@ def get_token_type(request, db: Session) -> str:
     return 'unknown'
 
 
+def _headers_to_dict(raw_headers: list) -> dict:
+    """Convert a raw ASGI header list [(name, value), ...] into a dict (first occurrence wins, like Headers.get)"""
+    headers = {}
+    for key, value in raw_headers:
+        name = key.decode('latin-1')
+        if name not in headers:
+            headers[name] = value.decode('latin-1')
+    return headers
+
+
 def _log_activity_sync_safe(safe_request_data: dict, safe_response_data: dict, execution_time_ms: float = None, request_data: dict = None, response_data: dict = None):
     """Synchronous logging function (runs in background thread) - uses safe request data"""
     import json
-    from starlette.requests import Request
-    from starlette.responses import Response
     
     # Skip logging for health checks or non-API endpoints
     path = safe_request_data.get('path', '')
@@ -333,9 +341,23 @@ def _log_activity_sync_safe(safe_request_data: dict, safe_response_data: dict, e
     if '?' in path:
         path = path.split('?')[0]
     
+    # Materialize header dicts here, off the request path, from the raw ASGI header list
+    headers = _headers_to_dict(safe_request_data.get('headers_raw', []))
+    if request_data and 'headers_raw' in request_data:
+        request_data.pop('headers_raw')
+        request_data['headers'] = headers
+    
+    # Parse MCP tool arguments lazily (the middleware only stores the raw header value)
+    mcp_info = request_data.get('mcp') if request_data else None
+    if isinstance(mcp_info, dict) and 'arguments_raw' in mcp_info:
+        arguments_raw = mcp_info.pop('arguments_raw')
+        try:
+            mcp_info['arguments'] = json.loads(arguments_raw) if arguments_raw else None
+        except (json.JSONDecodeError, TypeError):
+            mcp_info['arguments'] = arguments_raw
+    
     db = SessionLocal()
     try:
-        headers = safe_request_data.get('headers', {})
         
         # Check if this is an MCP-initiated call (for method detection)
         # Note: source is already determined by middleware and stored in request_data["source"]
@@ -547,7 +569,7 @@ def _log_activity_sync_safe(safe_request_data: dict, safe_response_data: dict, e
         db.close()
 
 
-async def log_activity(request: Request, response: Response, execution_time_ms: float = None, request_data: dict = None, response_data: dict = None):
+async def log_activity(request: Request, status_code: int, execution_time_ms: float = None, request_data: dict = None, response_data: dict = None):
     """Log an API activity to the database (async wrapper for background thread)"""
     import threading
     import sys
@@ -557,13 +579,13 @@ async def log_activity(request: Request, response: Response, execution_time_ms:
     safe_request_data = {
         'method': request.method,
         'path': str(request.url.path),
-        'headers': dict(request.headers),
+        'headers_raw': request.scope['headers'],
         'query_params': dict(request.query_params),
     }
     
     safe_response_data = {
-        'status_code': response.status_code,
-        'headers': dict(response.headers),
+        'status_code': status_code,
+        'headers': response_data.get('headers', {}) if response_data else {},
     }
     
     # Run logging in background thread to avoid blocking request
@@ -576,6 +598,31 @@ async def log_activity(request: Request, response: Response, execution_time_ms:
     # Don't wait for completion - let it run in background
 
 
+# Rows removed per DELETE statement when bulk-deleting activities
+DELETE_BATCH_SIZE = 5000
+
+
+def delete_activities_in_batches(db: Session, *criteria) -> int:
+    """
+    Delete activities matching criteria in batches of DELETE_BATCH_SIZE, committing after each.
+    Keeps every write transaction short so concurrent readers and the activity logger are
+    not blocked for the duration of a whole-table delete. Returns the number of rows deleted.
+    """
+    from sqlalchemy import delete, select
+    
+    deleted_count = 0
+    while True:
+        batch_ids = select(Activity.id).where(*criteria).limit(DELETE_BATCH_SIZE)
+        deleted = db.execute(
+            delete(Activity).where(Activity.id.in_(batch_ids)),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        db.commit()
+        deleted_count += deleted
+        if deleted < DELETE_BATCH_SIZE:
+            return deleted_count
+
+
 def cleanup_old_activities(days: int = 7):
     """Remove activities older than specified days"""
     from sqlalchemy import text
@@ -583,10 +630,7 @@ def cleanup_old_activities(days: int = 7):
     db = SessionLocal()
     try:
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        deleted_count = db.query(Activity).filter(
-            Activity.created_at < cutoff_date
-        ).delete()
-        db.commit()
+        deleted_count = delete_activities_in_batches(db, Activity.created_at < cutoff_date)
         
         # Run VACUUM periodically to reclaim space (every 1000 deletions or so)
         # This helps keep the database size manageable
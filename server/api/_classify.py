@@ -0,0 +1,148 @@
+"""
+Request classification for activity logging.
+
+Pure functions over the raw ASGI header list with no Starlette dependencies,
+fully annotated so the module can be compiled with mypyc. The middleware
+imports whichever build (compiled extension or this source) is available.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+
+# Raw header names inspected by the middleware. ASGI delivers header names as
+# lowercase bytes, so these can be compared directly without case folding.
+H_CLIENT_IP = b"x-client-ip"
+H_FORWARDED_FOR = b"x-forwarded-for"
+H_REAL_IP = b"x-real-ip"
+H_MCP_SOURCE = b"x-mcp-source"
+H_MCP_TOOL = b"x-mcp-tool"
+H_MCP_ARGUMENTS = b"x-mcp-arguments"
+H_INTERNAL_API_CALL = b"x-internal-api-call"
+H_REFERER = b"referer"
+H_ORIGIN = b"origin"
+H_USER_AGENT = b"user-agent"
+H_SEC_FETCH_SITE = b"sec-fetch-site"
+H_CONTENT_TYPE = b"content-type"
+H_CONTENT_LENGTH = b"content-length"
+
+NEEDED_HEADERS: frozenset[bytes] = frozenset((
+    H_CLIENT_IP,
+    H_FORWARDED_FOR,
+    H_REAL_IP,
+    H_MCP_SOURCE,
+    H_MCP_TOOL,
+    H_MCP_ARGUMENTS,
+    H_INTERNAL_API_CALL,
+    H_REFERER,
+    H_ORIGIN,
+    H_USER_AGENT,
+    H_SEC_FETCH_SITE,
+    H_CONTENT_TYPE,
+    H_CONTENT_LENGTH,
+))
+
+
+def scan_headers(raw_headers: list[tuple[bytes, bytes]]) -> dict[bytes, str]:
+    """Collect the headers used for classification in a single pass over the raw ASGI list.
+    
+    Keeps the first occurrence of each header, matching Headers.get().
+    """
+    needed: dict[bytes, str] = {}
+    for key, value in raw_headers:
+        if key in NEEDED_HEADERS and key not in needed:
+            needed[key] = value.decode("latin-1")
+    return needed
+
+
+def resolve_client_ip(headers: dict[bytes, str], client_host: Optional[str]) -> Optional[str]:
+    """Get client IP address - check X-Client-IP first (for MCP calls), then X-Forwarded-For, then X-Real-IP, then actual client"""
+    if headers.get(H_CLIENT_IP):
+        # MCP calls set this to "MCP"
+        return headers[H_CLIENT_IP]
+    if headers.get(H_FORWARDED_FOR):
+        # X-Forwarded-For can contain multiple IPs, take the first one
+        return headers[H_FORWARDED_FOR].split(",")[0].strip()
+    if headers.get(H_REAL_IP):
+        return headers[H_REAL_IP]
+    return client_host
+
+
+def is_ui_request(headers: dict[bytes, str], client_ip: Optional[str]) -> bool:
+    """Check if request is from the frontend/UI.
+    
+    Frontend requests typically have:
+    - Referer header pointing to the frontend URL
+    - Origin header matching the frontend
+    - Or we can check if it's from the same origin
+    """
+    referer = headers.get(H_REFERER, "")
+    origin = headers.get(H_ORIGIN, "")
+    user_agent = headers.get(H_USER_AGENT, "").lower()
+    is_ui = False
+    
+    # Check referer first (most reliable for frontend requests)
+    if referer:
+        # Check if referer is from the frontend (same origin or localhost)
+        if "localhost" in referer.lower() or "127.0.0.1" in referer or referer.startswith("/"):
+            is_ui = True
+    # Check origin
+    if origin:
+        # Check if origin is from the frontend
+        if "localhost" in origin.lower() or "127.0.0.1" in origin:
+            is_ui = True
+    # Check Sec-Fetch-Site header (modern browsers set this for same-origin requests)
+    if headers.get(H_SEC_FETCH_SITE) == "same-origin":
+        is_ui = True
+    # Fallback: Check if it's localhost with browser-like user-agent
+    if not is_ui and client_ip in ("127.0.0.1", "localhost"):
+        # If it's localhost, check user-agent
+        # Exclude curl and other non-browser clients
+        if user_agent and "curl" not in user_agent and "wget" not in user_agent and "python" not in user_agent:
+            # If it has a browser-like user-agent, it's likely from UI
+            if "mozilla" in user_agent or "chrome" in user_agent or "safari" in user_agent or "firefox" in user_agent or "electron" in user_agent:
+                is_ui = True
+    return is_ui
+
+
+def classify_request(headers: dict[bytes, str], client_host: Optional[str]) -> dict[str, object]:
+    """
+    Classify a request for activity logging.
+    
+    Returns a dict with client_ip, source ('ui', 'api' or 'mcp'), internal_api_call,
+    and mcp_tool / mcp_args (set only for direct MCP tool calls, not internal API calls).
+    """
+    client_ip = resolve_client_ip(headers, client_host)
+    internal_api_call = headers.get(H_INTERNAL_API_CALL)
+    
+    # Fast path: server-to-server calls issued by the MCP server itself. These are
+    # always MCP-sourced and never carry tool metadata, so skip everything else.
+    if internal_api_call == "true":
+        return {
+            "client_ip": client_ip,
+            "source": "mcp",
+            "internal_api_call": True,
+            "mcp_tool": None,
+            "mcp_args": None,
+        }
+    
+    # Direct MCP tool calls - also skip UI detection
+    if headers.get(H_MCP_SOURCE) == "true":
+        has_internal_header = bool(internal_api_call)
+        return {
+            "client_ip": client_ip,
+            "source": "mcp",
+            "internal_api_call": False,
+            # Tool information is only recorded for direct MCP calls, not internal API calls
+            "mcp_tool": None if has_internal_header else headers.get(H_MCP_TOOL),
+            "mcp_args": None if has_internal_header else headers.get(H_MCP_ARGUMENTS),
+        }
+    
+    return {
+        "client_ip": client_ip,
+        # UI requests come from the frontend; everything else is an external API call
+        "source": "ui" if is_ui_request(headers, client_ip) else "api",
+        "internal_api_call": False,
+        "mcp_tool": None,
+        "mcp_args": None,
+    }
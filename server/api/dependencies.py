@@ -1,9 +1,10 @@
 """Common dependencies for API routes"""
+from typing import Optional, Tuple
 from fastapi import Depends, Security, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
-from ..auth import get_db, verify_project_access_by_id
+from ..auth import get_db, verify_project_access_by_id, get_auth_context, AuthContext
 from ..models import Project, Device, Secret
 from .utils import get_project_by_name
 
@@ -30,6 +31,26 @@ def get_project_with_access(
     return project
 
 
+def resolve_auth_project(
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+) -> Tuple[AuthContext, Optional[str]]:
+    """
+    Dependency that resolves which project's data the caller may see.
+    Returns (auth, project_name) where project_name is:
+    - None for master tokens (no project restriction)
+    - "" when the token is not tied to an existing project (no data visible)
+    - the project name for project tokens
+    Only the project name is selected, not the whole Project row.
+    """
+    if auth.is_master:
+        return auth, None
+    if not auth.token or not auth.project_id:
+        return auth, ""
+    project_name = db.query(Project.name).filter(Project.id == auth.project_id).scalar()
+    return auth, project_name or ""
+
+
 def get_device_by_id(
     device_id: str,
     project_name: str,
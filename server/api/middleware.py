@@ -1,109 +1,145 @@
 """Middleware for API"""
+import re
 import time
 import json
-from starlette.middleware.base import BaseHTTPMiddleware
+import orjson
+from starlette.datastructures import Headers
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from ..activity_logger import log_activity
 from ..confidential_tracker import ConfidentialTracker
-from .utils import get_client_ip
+from ._classify import scan_headers, classify_request, H_CONTENT_TYPE, H_CONTENT_LENGTH
 
 
-class ActivityLoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to log all API activities"""
-    async def dispatch(self, request: Request, call_next):
-        # Record start time
-        start_time = time.time()
+# Request bodies are never captured for these content types - they are binary
+# payloads that cannot be usefully decoded
+SKIP_BODY_CONTENT_TYPES = (
+    "multipart/form-data",
+    "application/octet-stream",
+    "image/",
+    "video/",
+    "audio/",
+)
+
+# Endpoints whose responses carry confidential values. The last matched group
+# (match.lastgroup) names the endpoint kind used to look up its marking handler.
+_PATH_RE = re.compile(
+    r"^/api/(?:"
+    r"projects/(?P<project>[^/]+)/(?:secrets/(?P<secret>[^/]+)|(?P<tokens>tokens))"
+    r"|(?P<master_tokens>master-tokens)"
+    r")$"
+)
+
+
+def _mark_secret(response_data: dict, match: re.Match):
+    """Mark secrets returned from get_secret endpoints"""
+    body = response_data["body"]
+    if "value" in body:
+        ConfidentialTracker.mark_secret(
+            response_data,
+            "body.value",
+            body.get("key", "unknown"),
+            match.group("project") or "unknown"
+        )
+
+
+def _mark_project_token(response_data: dict, match: re.Match):
+    """Mark tokens returned from create_token endpoints"""
+    body = response_data["body"]
+    if "token" in body:
+        ConfidentialTracker.mark_token(
+            response_data,
+            "body.token",
+            "project",
+            body.get("name", "unknown"),
+            body.get("id"),
+            match.group("project")
+        )
+
+
+def _mark_master_token(response_data: dict, match: re.Match):
+    """Mark master tokens returned from create_master_token"""
+    body = response_data["body"]
+    if "token" in body:
+        ConfidentialTracker.mark_token(
+            response_data,
+            "body.token",
+            "master",
+            body.get("name", "unknown"),
+            body.get("id")
+        )
+
+
+_MARK_HANDLERS = {
+    ("secret", "GET"): _mark_secret,
+    ("tokens", "POST"): _mark_project_token,
+    ("master_tokens", "POST"): _mark_master_token,
+}
+
+
+class ActivityLoggingMiddleware:
+    """Middleware to log all API activities.
+    
+    Implemented as a pure ASGI middleware so the response is forwarded to the
+    client message by message while a copy of the body is captured for logging.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request = Request(scope, receive)
+        
+        # Record start time (monotonic, integer nanoseconds)
+        start_ns = time.perf_counter_ns()
         
         # Capture request data
-        # Get client IP address - check X-Client-IP first (for MCP calls), then X-Forwarded-For, then X-Real-IP, then actual client
-        client_ip = None
-        if request.headers.get("X-Client-IP"):
-            # MCP calls set this to "MCP"
-            client_ip = request.headers.get("X-Client-IP")
-        elif request.headers.get("x-forwarded-for"):
-            # X-Forwarded-For can contain multiple IPs, take the first one
-            client_ip = request.headers.get("x-forwarded-for").split(",")[0].strip()
-        elif request.headers.get("x-real-ip"):
-            client_ip = request.headers.get("x-real-ip")
-        elif request.client:
-            client_ip = request.client.host
+        headers = scan_headers(scope["headers"])
+        client = scope.get("client")
+        classification = classify_request(headers, client[0] if client else None)
         
         request_data = {
-            "client_ip": client_ip,
-            "headers": dict(request.headers),
+            "client_ip": classification["client_ip"],
+            "headers_raw": scope["headers"],  # Converted to a dict by the background logger
             "query_params": dict(request.query_params),
             "path_params": dict(request.path_params) if hasattr(request, 'path_params') else {},
             "body": None
         }
         
-        # Extract MCP tool information if present (only for direct MCP calls, not internal API calls)
-        if request.headers.get("X-MCP-Source") == "true" and not request.headers.get("X-Internal-API-Call"):
-            mcp_tool = request.headers.get("X-MCP-Tool")
-            mcp_args = request.headers.get("X-MCP-Arguments")
-            if mcp_tool or mcp_args:
-                request_data["mcp"] = {
-                    "tool": mcp_tool,
-                    "arguments": json.loads(mcp_args) if mcp_args else None,
-                    "source": "mcp"
-                }
+        # Attach MCP tool information (only present for direct MCP calls, not internal API calls)
+        mcp_tool = classification["mcp_tool"]
+        mcp_args = classification["mcp_args"]
+        if mcp_tool or mcp_args:
+            request_data["mcp"] = {
+                "tool": mcp_tool,
+                "arguments_raw": mcp_args,  # Parsed by the background logger
+                "source": "mcp"
+            }
         
-        # Determine source: 3-state system (ui, api, mcp)
-        # State 1: MCP calls (both direct and internal)
-        if request.headers.get("X-Internal-API-Call") == "true" or request.headers.get("X-MCP-Source") == "true":
-            # All MCP-related calls (internal server-to-server or direct MCP tool calls)
-            request_data["source"] = "mcp"
-            if request.headers.get("X-Internal-API-Call") == "true":
-                request_data["internal_api_call"] = True
-        else:
-            # Check if request is from the frontend/UI
-            # Frontend requests typically have:
-            # - Referer header pointing to the frontend URL
-            # - Origin header matching the frontend
-            # - Or we can check if it's from the same origin
-            referer = request.headers.get("referer", "")
-            origin = request.headers.get("origin", "")
-            
-            # Check if referer or origin indicates it's from the frontend
-            # Frontend typically runs on the same host or has a specific pattern
-            is_ui_request = False
-            user_agent = request.headers.get("user-agent", "").lower()
-            
-            # Check referer first (most reliable for frontend requests)
-            if referer:
-                # Check if referer is from the frontend (same origin or localhost)
-                if "localhost" in referer.lower() or "127.0.0.1" in referer or referer.startswith("/"):
-                    is_ui_request = True
-            # Check origin
-            if origin:
-                # Check if origin is from the frontend
-                if "localhost" in origin.lower() or "127.0.0.1" in origin:
-                    is_ui_request = True
-            # Check Sec-Fetch-Site header (modern browsers set this for same-origin requests)
-            if request.headers.get("sec-fetch-site") == "same-origin":
-                is_ui_request = True
-            # Fallback: Check if it's localhost with browser-like user-agent
-            if not is_ui_request and client_ip in ["127.0.0.1", "localhost"]:
-                # If it's localhost, check user-agent
-                # Exclude curl and other non-browser clients
-                if user_agent and "curl" not in user_agent and "wget" not in user_agent and "python" not in user_agent:
-                    # If it has a browser-like user-agent, it's likely from UI
-                    if "mozilla" in user_agent or "chrome" in user_agent or "safari" in user_agent or "firefox" in user_agent or "electron" in user_agent:
-                        is_ui_request = True
-            
-            if is_ui_request:
-                # State 2: UI requests (from frontend)
-                request_data["source"] = "ui"
-            else:
-                # State 3: External API calls (remote clients using tokens)
-                request_data["source"] = "api"
+        request_data["source"] = classification["source"]
+        if classification["internal_api_call"]:
+            request_data["internal_api_call"] = True
         
         # Read request body if present (for POST, PUT, PATCH)
         body_bytes = b""
-        if request.method in ["POST", "PUT", "PATCH"]:
+        body_read = False
+        content_type = headers.get(H_CONTENT_TYPE, "").lower()
+        capture_body = request.method in ["POST", "PUT", "PATCH"]
+        if capture_body and content_type.startswith(SKIP_BODY_CONTENT_TYPES):
+            # Binary/multipart upload - record its shape without reading or decoding it
+            content_length = headers.get(H_CONTENT_LENGTH)
+            request_data["body"] = {
+                "content_type": content_type,
+                "size": int(content_length) if content_length and content_length.isdigit() else None
+            }
+        elif capture_body:
             try:
                 body_bytes = await request.body()
+                body_read = True
                 if body_bytes:
                     # Try to parse as JSON, otherwise store as string
                     try:
@@ -113,95 +149,69 @@ class ActivityLoggingMiddleware(BaseHTTPMiddleware):
             except Exception as e:
                 request_data["body_error"] = str(e)
         
-        # Recreate request with body if we consumed it
-        if body_bytes:
-            async def receive():
-                return {"type": "http.request", "body": body_bytes}
-            request._receive = receive
+        # Replay the body we consumed (even an empty one - the app would otherwise wait on
+        # the drained receive channel forever), then hand control back to the real receive channel
+        if body_read:
+            body_replayed = False
+            
+            async def receive_with_body() -> Message:
+                nonlocal body_replayed
+                if not body_replayed:
+                    body_replayed = True
+                    return {"type": "http.request", "body": body_bytes, "more_body": False}
+                return await receive()
+            receive = receive_with_body
+        
+        # Forward response messages unchanged while teeing the body into a buffer
+        status_code = 500
+        response_headers = {}
+        response_body = bytearray()
+        
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = dict(Headers(raw=message.get("headers", [])))
+            elif message["type"] == "http.response.body":
+                response_body.extend(message.get("body", b""))
+            await send(message)
         
         # Process request
-        response = await call_next(request)
+        await self.app(scope, receive, send_wrapper)
         
         # Capture response data
         response_data = {
-            "headers": dict(response.headers),
+            "headers": response_headers,
             "body": None
         }
         
-        # Read response body
+        # Parse the captured response body
         try:
-            response_body = b""
-            async for chunk in response.body_iterator:
-                response_body += chunk
-            
-            if response_body:
-                # Try to parse as JSON, otherwise store as string
-                try:
-                    response_data["body"] = json.loads(response_body.decode('utf-8'))
-                    
-                    # V2: Add confidential metadata based on endpoint and response structure
-                    # This allows fast O(1) exposure detection without DB scanning
-                    path = str(request.url.path)
-                    
-                    # Mark secrets returned from get_secret endpoints
-                    if "/secrets/" in path and path.endswith("/secrets/" + path.split("/secrets/")[-1]):
-                        # This is a get_secret endpoint
-                        if isinstance(response_data["body"], dict) and "value" in response_data["body"]:
-                            secret_key = response_data["body"].get("key", "unknown")
-                            project_name = path.split("/projects/")[1].split("/")[0] if "/projects/" in path else None
-                            ConfidentialTracker.mark_secret(
-                                response_data,
-                                "body.value",
-                                secret_key,
-                                project_name or "unknown"
-                            )
-                    
-                    # Mark tokens returned from create_token endpoints
-                    if path.endswith("/tokens") and request.method == "POST":
-                        if isinstance(response_data["body"], dict) and "token" in response_data["body"]:
-                            token_type = "project"  # Project tokens
-                            project_name = path.split("/projects/")[1].split("/")[0] if "/projects/" in path else None
-                            token_name = response_data["body"].get("name", "unknown")
-                            token_id = response_data["body"].get("id")
-                            ConfidentialTracker.mark_token(
-                                response_data,
-                                "body.token",
-                                token_type,
-                                token_name,
-                                token_id,
-                                project_name
-                            )
+            # Compressed bodies (e.g. the pre-gzipped /api/docs) are not decoded for the log
+            if response_body and "content-encoding" not in response_headers:
+                if response_headers.get("content-type", "").startswith("application/json"):
+                    # JSON response - orjson parses the raw bytes without a separate decode step
+                    try:
+                        response_data["body"] = orjson.loads(response_body)
                     
-                    # Mark master tokens
-                    if path == "/api/master-tokens" and request.method == "POST":
-                        if isinstance(response_data["body"], dict) and "token" in response_data["body"]:
-                            ConfidentialTracker.mark_token(
-                                response_data,
-                                "body.token",
-                                "master",
-                                response_data["body"].get("name", "unknown"),
-                                response_data["body"].get("id")
-                            )
+                        # V2: Add confidential metadata based on endpoint and response structure
+                        # This allows fast O(1) exposure detection without DB scanning
+                        match = _PATH_RE.match(scope["path"])
+                        if match:
+                            handler = _MARK_HANDLERS.get((match.lastgroup, request.method))
+                            if handler and isinstance(response_data["body"], dict):
+                                handler(response_data, match)
                     
-                except (json.JSONDecodeError, UnicodeDecodeError):
+                    except orjson.JSONDecodeError:
+                        response_data["body"] = response_body.decode('utf-8', errors='replace')
+                else:
+                    # Non-JSON response (HTML, plain text, binary) - skip the parse attempt
                     response_data["body"] = response_body.decode('utf-8', errors='replace')
-            
-            # Create new response with the body (since we consumed it)
-            from starlette.responses import Response as StarletteResponse
-            new_response = StarletteResponse(
-                content=response_body,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type
-            )
         except Exception as e:
             response_data["body_error"] = str(e)
-            new_response = response
         
         # Calculate execution time
-        execution_time_ms = (time.time() - start_time) * 1000  # Convert to milliseconds
+        execution_time_ms = (time.perf_counter_ns() - start_ns) / 1_000_000  # Convert to milliseconds
         
-        # Log activity after response is generated
-        await log_activity(request, new_response, execution_time_ms, request_data, response_data)
-        return new_response
-
+        # Log activity after response has been sent
+        await log_activity(request, status_code, execution_time_ms, request_data, response_data)
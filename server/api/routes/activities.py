@@ -1,19 +1,251 @@
 """Activity management routes"""
 import json
-from fastapi import APIRouter, Depends, HTTPException, status, Security, Query
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from sqlalchemy import text, func, case, cast, Date, or_, and_
-from typing import Optional
+import base64
+import binascii
+import threading
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, Query as ORMQuery, defer
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import select, text, func, case, or_, and_
+from typing import Callable, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 
-from ...models import Project, Activity
-from ...schemas import ActivityListResponse
-from ...auth import get_db, get_auth_context
-from ..dependencies import get_project_with_access
+from ...models import Project, Activity, Secret, Token, Device
+from ...schemas import ActivityListResponse, ActivityResponse
+from ...activity_logger import delete_activities_in_batches
+from ...auth import get_db, get_auth_context, AuthContext
+from ..dependencies import get_project_with_access, resolve_auth_project
 
 router = APIRouter(tags=["activities"])
 
+# Short-lived cache for the 7-day stats endpoints, keyed on (endpoint, auth scope, ...).
+# Dashboards poll these endpoints, so counts may lag new activity by up to the TTL;
+# flushing activities clears it. Sync routes run in a threadpool, hence the lock.
+_stats_cache = TTLCache(maxsize=256, ttl=30)
+_stats_cache_lock = threading.Lock()
+
+
+def _get_cached_stats(key: tuple) -> Optional[dict]:
+    """Return a cached stats response, or None on a miss"""
+    with _stats_cache_lock:
+        return _stats_cache.get(key)
+
+
+def _cache_stats(key: tuple, result: dict) -> dict:
+    """Store a stats response in the cache and return it"""
+    with _stats_cache_lock:
+        _stats_cache[key] = result
+    return result
+
+# Activity lists are streamed as newline-delimited JSON when the client accepts it
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_YIELD_PER = 25
+
+
+# Filter clauses shared by the activity list and daily stats endpoints, built once at import
+_EXPOSED_CLAUSES = (
+    Activity.exposed_confidential_data == True,  # Generated column, uses the partial index
+)
+_VALID_REQUEST_DATA_CLAUSES = (
+    Activity.request_data.isnot(None),
+    text("json_valid(request_data) = 1"),
+)
+_NOT_UI_CLAUSE = or_(Activity.request_source != 'ui', Activity.request_source.is_(None))
+_SECRET_KEY_CLAUSE = text(
+    "(json_extract(request_data, '$.body.key') = :breakdown_value"
+    " OR json_extract(request_data, '$.key') = :breakdown_value)"
+)
+
+
+# Predicate for each `source` filter value, applied to an Activity query
+SOURCE_FILTERS: Dict[str, Callable[[ORMQuery], ORMQuery]] = {
+    # Activities without a project (project_name is null)
+    "root": lambda q: q.filter(Activity.project_name.is_(None)),
+    # Activities with a project (project_name is not null)
+    "project": lambda q: q.filter(Activity.project_name.isnot(None)),
+    # Activities whose response exposed confidential data
+    "exposed": lambda q: q.filter(*_EXPOSED_CLAUSES),
+    # IP filter: exclude UI events, only show API and MCP
+    "ip": lambda q: q.filter(*_VALID_REQUEST_DATA_CLAUSES, _NOT_UI_CLAUSE),
+    # Token filter: only show activities with Bearer Authorization header
+    "token": lambda q: q.filter(Activity.masked_token.isnot(None)),
+    # Device filter: only show activities addressing a device (/devices/ in path)
+    "device": lambda q: q.filter(Activity.resource_kind == 'device'),
+    # Request source recorded by the logging middleware (generated column, indexed with created_at)
+    "ui": lambda q: q.filter(Activity.request_source == 'ui'),
+    "api": lambda q: q.filter(Activity.request_source == 'api'),
+    "mcp": lambda q: q.filter(Activity.request_source == 'mcp'),
+}
+
+
+def _loads_json(raw: str):
+    """Parse a stored JSON column with orjson, falling back to json for values orjson rejects (e.g. NaN)"""
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return json.loads(raw)
+
+
+def _encode_cursor(activity: Activity) -> str:
+    """Encode the (created_at, id) position of an activity as an opaque pagination cursor"""
+    raw = f"{activity.created_at.isoformat()}|{activity.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    """Decode a pagination cursor into (created_at, id), raising 400 if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, activity_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), activity_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _apply_cursor(query, cursor: str):
+    """Restrict an activity query to rows after the cursor position in (created_at, id) DESC order"""
+    cursor_created_at, cursor_id = _decode_cursor(cursor)
+    return query.filter(
+        or_(
+            Activity.created_at < cursor_created_at,
+            and_(Activity.created_at == cursor_created_at, Activity.id < cursor_id)
+        )
+    )
+
+
+def _paginate(
+    base_query,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_bodies: bool = True
+):
+    """
+    Fetch one page of activities, newest first.
+    
+    With a cursor, uses keyset pagination on (created_at, id) so deep pages cost the
+    same as the first one; otherwise falls back to OFFSET.
+    The total number of matching rows is read from a COUNT(*) OVER () column on
+    the same query instead of a separate COUNT query.
+    Uses a deferred join: the filter, ordering and offset/limit run over ids only,
+    and full rows are loaded just for the selected page. Unless include_bodies is
+    set, the request_data/response_data blobs are not read at all and come back as None.
+    Returns (activities, total, has_more, next_cursor).
+    """
+    id_query = base_query.with_entities(Activity.id)
+    # The window count runs after WHERE, so it only covers the whole result set
+    # when no cursor predicate has been added to the query
+    window_total = not cursor
+    if window_total:
+        id_query = id_query.add_columns(func.count().over().label("total"))
+    if cursor:
+        id_query = _apply_cursor(id_query, cursor)
+    id_query = id_query.order_by(Activity.created_at.desc(), Activity.id.desc())
+    if offset and not cursor:
+        id_query = id_query.offset(offset)
+    id_sq = id_query.limit(limit + 1).subquery()
+    
+    # Join the page of ids back to the full rows
+    query = base_query.session.query(Activity).join(id_sq, Activity.id == id_sq.c.id)
+    if window_total:
+        query = query.add_columns(id_sq.c.total)
+    if not include_bodies:
+        query = query.options(defer(Activity.request_data), defer(Activity.response_data))
+    rows = query.order_by(Activity.created_at.desc(), Activity.id.desc()).all()
+    
+    total = None
+    if window_total:
+        activities = [row.Activity for row in rows]
+        if rows:
+            total = rows[0].total
+        elif not offset:
+            total = 0
+    else:
+        activities = rows
+    if not include_bodies:
+        # Fill the deferred columns without a lazy load (and without marking the rows dirty)
+        for activity in activities:
+            set_committed_value(activity, "request_data", None)
+            set_committed_value(activity, "response_data", None)
+    if total is None:
+        # Cursor page, or an offset past the end - no row carried the window count
+        total = base_query.count()
+    
+    # Check if there are more records
+    has_more = len(activities) > limit
+    if has_more:
+        activities = activities[:limit]
+    
+    next_cursor = _encode_cursor(activities[-1]) if has_more else None
+    return activities, total, has_more, next_cursor
+
+
+def _count_activities(base_query, include_avg_response_time: bool = False):
+    """
+    Count total, MCP, exposed and MCP-exposed activities in a single scan using conditional sums.
+    Returns (total, mcp, exposed, mcp_exposed), plus the rounded average response time in ms
+    (None when no activity has one) if include_avg_response_time is set.
+    """
+    exposed = and_(*_EXPOSED_CLAUSES)
+    columns = [
+        func.count().label('total'),
+        func.sum(case((Activity.method == 'MCP', 1), else_=0)).label('mcp'),
+        func.sum(case((exposed, 1), else_=0)).label('exposed'),
+        func.sum(case((and_(Activity.method == 'MCP', exposed), 1), else_=0)).label('mcp_exposed')
+    ]
+    if include_avg_response_time:
+        # AVG skips NULL execution times, so no extra filter is needed
+        columns.append(func.avg(Activity.execution_time_ms).label('avg_response_time'))
+    row = base_query.with_entities(*columns).one()
+    # SUM over zero rows is NULL
+    counts = (row.total, row.mcp or 0, row.exposed or 0, row.mcp_exposed or 0)
+    if not include_avg_response_time:
+        return counts
+    avg_response_time = round(row.avg_response_time) if row.avg_response_time is not None else None
+    return counts + (avg_response_time,)
+
+
+def _count_subquery(model, *criteria):
+    """Scalar subquery counting the rows of model matching criteria"""
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+def _stream_ndjson(
+    base_query,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_bodies: bool = True
+) -> StreamingResponse:
+    """
+    Stream one page of activities, newest first, as NDJSON (one ActivityResponse per line).
+    Rows are fetched NDJSON_YIELD_PER at a time, so only a handful of ORM objects
+    (and their JSON blobs) are held in memory while the response is written.
+    """
+    query = base_query
+    if cursor:
+        query = _apply_cursor(query, cursor)
+    query = query.order_by(Activity.created_at.desc(), Activity.id.desc())
+    if offset and not cursor:
+        query = query.offset(offset)
+    if not include_bodies:
+        query = query.options(defer(Activity.request_data), defer(Activity.response_data))
+    
+    def lines():
+        for activity in query.limit(limit).yield_per(NDJSON_YIELD_PER):
+            if not include_bodies:
+                set_committed_value(activity, "request_data", None)
+                set_committed_value(activity, "response_data", None)
+            yield orjson.dumps(ActivityResponse.model_validate(activity).model_dump()) + b"\n"
+    
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
 
 @router.get("/api/projects/{project_name}/activities", response_model=ActivityListResponse)
 def get_project_activities(
@@ -22,7 +254,9 @@ def get_project_activities(
     limit: int = Query(25, ge=1, le=100, description="Number of activities to return"),
     offset: int = Query(0, ge=0, description="Number of activities to skip"),
     method: Optional[str] = Query(None, description="Filter by HTTP method (e.g., 'MCP', 'GET', 'POST')"),
-    exclude_ui: bool = Query(False, description="Exclude UI-initiated requests (source='ui')")
+    exclude_ui: bool = Query(False, description="Exclude UI-initiated requests (source='ui')"),
+    cursor: Optional[str] = Query(None, description="Pagination cursor from a previous response's next_cursor (takes precedence over offset)"),
+    exclude_bodies: bool = Query(False, description="Leave out request_data/response_data (returned as null) to skip reading the bodies")
 ):
     """Get activity history for a project with pagination - requires master token or project token (own project only)"""
     
@@ -37,98 +271,66 @@ def get_project_activities(
     if method:
         base_query = base_query.filter(Activity.method == method)
     
-    # Get all matching activities (we'll filter exclude_ui in Python since it requires JSON parsing)
-    # Debug: Check query before execution
-    # print(f"DEBUG: Querying activities for project: {project.name}, method: {method}, exclude_ui: {exclude_ui}")
-    all_activities = base_query.order_by(Activity.created_at.desc()).all()
-    # Debug: Check results
-    # print(f"DEBUG: Found {len(all_activities)} activities before exclude_ui filter")
-    
-    # Apply exclude_ui filter if requested (filter in Python for JSON field)
+    # Apply exclude_ui filter at SQL level (MCP activities and rows without parseable request_data are always kept)
     if exclude_ui:
-        filtered_activities = []
-        for activity in all_activities:
-            if activity.method == 'MCP':
-                # Always include MCP activities
-                filtered_activities.append(activity)
-            elif activity.request_data:
-                try:
-                    request_data = json.loads(activity.request_data)
-                    source = request_data.get("source")
-                    # Exclude UI activities, include everything else
-                    if source != 'ui':
-                        filtered_activities.append(activity)
-                except:
-                    # If we can't parse, include it (assume not UI)
-                    filtered_activities.append(activity)
-            else:
-                # No request_data, include it (assume not UI)
-                filtered_activities.append(activity)
-        all_activities = filtered_activities
-    
-    # Get total count after filtering
-    total = len(all_activities)
-    
-    # Apply pagination
-    paginated_activities = all_activities[offset:offset + limit + 1]
+        base_query = base_query.filter(
+            or_(
+                Activity.method == 'MCP',
+                _NOT_UI_CLAUSE
+            )
+        )
     
-    # Check if there are more records
-    has_more = len(paginated_activities) > limit
-    if has_more:
-        paginated_activities = paginated_activities[:limit]
+    # Get paginated results together with the total count after filtering
+    paginated_activities, total, has_more, next_cursor = _paginate(
+        base_query, limit, offset, cursor, include_bodies=not exclude_bodies
+    )
     
     return ActivityListResponse(
         activities=paginated_activities,
         total=total,
-        has_more=has_more
+        has_more=has_more,
+        next_cursor=next_cursor
     )
 
 
 @router.get("/api/activities/recent", response_model=ActivityListResponse)
 def get_recent_activities(
-    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+    auth_project: Tuple[AuthContext, Optional[str]] = Depends(resolve_auth_project),
     db: Session = Depends(get_db),
-    limit: int = Query(25, ge=1, le=100, description="Number of activities to return")
+    limit: int = Query(25, ge=1, le=100, description="Number of activities to return"),
+    cursor: Optional[str] = Query(None, description="Pagination cursor from a previous response's next_cursor"),
+    exclude_bodies: bool = Query(False, description="Leave out request_data/response_data (returned as null) to skip reading the bodies")
 ):
     """Get recent activities (last 7 days) - supports both master and project tokens"""
-    auth = get_auth_context(credentials, db)
-    
     # Get all activities (last 7 days)
     cutoff_date = datetime.utcnow() - timedelta(days=7)
     
-    if auth.is_master:
-        base_query = db.query(Activity).filter(Activity.created_at >= cutoff_date)
-    else:
+    _, project_scope = auth_project
+    if project_scope == "":
+        # Token not tied to an existing project - nothing to show
+        return ActivityListResponse(activities=[], total=0, has_more=False)
+    
+    base_query = db.query(Activity).filter(Activity.created_at >= cutoff_date)
+    if project_scope is not None:
         # For project tokens, only get activities for their project
-        if not auth.token or not auth.project_id:
-            return ActivityListResponse(activities=[], total=0, has_more=False)
-        
-        from ...models import Project
-        project = db.query(Project).filter(Project.id == auth.project_id).first()
-        if not project:
-            return ActivityListResponse(activities=[], total=0, has_more=False)
-        
-        base_query = db.query(Activity).filter(
-            Activity.created_at >= cutoff_date,
-            Activity.project_name == project.name
-        )
+        base_query = base_query.filter(Activity.project_name == project_scope)
     
     # Get the most recent activities (ordered by created_at desc)
-    activities = base_query.order_by(Activity.created_at.desc()).limit(limit).all()
-    
-    # Get total count
-    total = base_query.count()
+    activities, total, has_more, next_cursor = _paginate(
+        base_query, limit, cursor=cursor, include_bodies=not exclude_bodies
+    )
     
     return ActivityListResponse(
         activities=activities,
         total=total,
-        has_more=False  # No pagination for recent activities
+        has_more=has_more,
+        next_cursor=next_cursor
     )
 
 
 @router.get("/api/activities", response_model=ActivityListResponse)
 def get_all_activities(
-    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+    auth_project: Tuple[AuthContext, Optional[str]] = Depends(resolve_auth_project),
     db: Session = Depends(get_db),
     limit: int = Query(25, ge=1, le=100, description="Number of activities to return"),
     offset: int = Query(0, ge=0, description="Number of activities to skip"),
@@ -136,30 +338,28 @@ def get_all_activities(
     exposed_only: bool = Query(False, description="Filter to only activities with exposed confidential data"),
     breakdown: Optional[str] = Query(None, description="Filter by breakdown type: project, secret, token, device, mcp_tool"),
     breakdown_value: Optional[str] = Query(None, description="Filter by specific breakdown value (e.g., project name, secret key, etc.)"),
-    source: Optional[str] = Query(None, description="Filter by source: 'ui', 'api', or 'mcp'. Omit to show all.")
+    source: Optional[str] = Query(None, description="Filter by source: 'ui', 'api', or 'mcp'. Omit to show all."),
+    cursor: Optional[str] = Query(None, description="Pagination cursor from a previous response's next_cursor (takes precedence over offset)"),
+    exclude_bodies: bool = Query(False, description="Leave out request_data/response_data (returned as null) to skip reading the bodies"),
+    accept: Optional[str] = Header(None)
 ):
-    """Get all activities across all projects (master token) or project-specific (project token)"""
-    auth = get_auth_context(credentials, db)
+    """Get all activities across all projects (master token) or project-specific (project token).
     
+    With `Accept: application/x-ndjson` the page is streamed as one activity per line
+    (no total/has_more/next_cursor envelope).
+    """
     # Get all activities (last 7 days)
     cutoff_date = datetime.utcnow() - timedelta(days=7)
     
-    if auth.is_master:
-        base_query = db.query(Activity).filter(Activity.created_at >= cutoff_date)
-    else:
+    _, project_scope = auth_project
+    if project_scope == "":
+        # Token not tied to an existing project - nothing to show
+        return ActivityListResponse(activities=[], total=0, has_more=False)
+    
+    base_query = db.query(Activity).filter(Activity.created_at >= cutoff_date)
+    if project_scope is not None:
         # For project tokens, only get activities for their project
-        if not auth.token or not auth.project_id:
-            return ActivityListResponse(activities=[], total=0, has_more=False)
-        
-        from ...models import Project
-        project = db.query(Project).filter(Project.id == auth.project_id).first()
-        if not project:
-            return ActivityListResponse(activities=[], total=0, has_more=False)
-        
-        base_query = db.query(Activity).filter(
-            Activity.created_at >= cutoff_date,
-            Activity.project_name == project.name
-        )
+        base_query = base_query.filter(Activity.project_name == project_scope)
     
     # Apply method filter if provided
     if method:
@@ -175,22 +375,20 @@ def get_all_activities(
                 # Filter by secret key in path or request_data
                 base_query = base_query.filter(
                     or_(
-                        Activity.path.like(f'%/secrets/{breakdown_value}%'),
+                        and_(Activity.resource_kind == 'secret', Activity.resource_id == breakdown_value),
                         and_(
                             Activity.action == 'create_secret',
-                            or_(
-                                text(f"json_extract(request_data, '$.body.key') = '{breakdown_value}'"),
-                                text(f"json_extract(request_data, '$.key') = '{breakdown_value}'")
-                            )
+                            # Bound parameter keeps the value out of the SQL text (safe, and the statement is reusable)
+                            _SECRET_KEY_CLAUSE.bindparams(breakdown_value=breakdown_value)
                         )
                     )
                 )
             elif breakdown == "token":
                 # Filter by token ID in path
-                base_query = base_query.filter(Activity.path.like(f'%/tokens/{breakdown_value}%'))
+                base_query = base_query.filter(Activity.resource_kind == 'token', Activity.resource_id == breakdown_value)
             elif breakdown == "device":
                 # Filter by device ID in path
-                base_query = base_query.filter(Activity.path.like(f'%/devices/{breakdown_value}%'))
+                base_query = base_query.filter(Activity.resource_kind == 'device', Activity.resource_id == breakdown_value)
             elif breakdown == "mcp_tool":
                 # Filter by MCP tool name in action
                 base_query = base_query.filter(Activity.action == f'mcp_{breakdown_value}')
@@ -200,131 +398,63 @@ def get_all_activities(
                 # Filter to show all secret-related activities
                 base_query = base_query.filter(
                     or_(
-                        Activity.path.like('%/secrets/%'),
+                        Activity.resource_kind == 'secret',
                         Activity.action.in_(['create_secret', 'get_secret', 'delete_secret', 'check_secret_exists'])
                     )
                 )
             elif breakdown == "token":
                 # Filter to show all token-related activities
-                base_query = base_query.filter(Activity.path.like('%/tokens/%'))
+                base_query = base_query.filter(Activity.resource_kind == 'token')
             elif breakdown == "device":
                 # Filter to show all device-related activities
-                base_query = base_query.filter(Activity.path.like('%/devices/%'))
+                base_query = base_query.filter(Activity.resource_kind == 'device')
             elif breakdown == "mcp_tool":
                 # Filter to show all MCP-related activities
                 base_query = base_query.filter(Activity.method == 'MCP')
             # Note: "project" breakdown without value doesn't make sense, so we don't filter
     
     # Apply source filter at SQL level (efficient filtering)
-    if source:
-        if source == "root":
-            # Filter by activities without project name (project_name is null)
-            base_query = base_query.filter(Activity.project_name.is_(None))
-        elif source == "project":
-            # Filter by activities with project name (project_name is not null)
-            base_query = base_query.filter(Activity.project_name.isnot(None))
-        elif source == "exposed":
-            # Filter by exposed confidential data using SQLite JSON functions
-            base_query = base_query.filter(
-                Activity.response_data.isnot(None),
-                text("json_valid(response_data) = 1"),
-                text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-            )
-        elif source == "ip":
-            # IP filter: exclude UI events, only show API and MCP
-            base_query = base_query.filter(
-                Activity.request_data.isnot(None),
-                text("json_valid(request_data) = 1"),
-                text("json_extract(request_data, '$.source') != 'ui' OR json_extract(request_data, '$.source') IS NULL")
-            )
-        elif source == "token":
-            # Token filter: only show activities with Bearer Authorization header
-            base_query = base_query.filter(
-                Activity.request_data.isnot(None),
-                text("json_extract(request_data, '$.headers.authorization') LIKE 'Bearer %' OR json_extract(request_data, '$.headers.Authorization') LIKE 'Bearer %'")
-            )
-        elif source == "device":
-            # Device filter: only show activities with /devices/ in path
-            base_query = base_query.filter(Activity.path.like('%/devices/%'))
-        else:
-            # Filter by source (ui, api, mcp) using SQLite JSON functions
-            base_query = base_query.filter(
-                text("json_extract(request_data, '$.source') = :source")
-            ).params(source=source)
+    if source in SOURCE_FILTERS:
+        base_query = SOURCE_FILTERS[source](base_query)
     
     # Apply exposed_only filter if requested
     if exposed_only:
-        try:
-            base_query = base_query.filter(
-                Activity.response_data.isnot(None),
-                text("json_valid(response_data) = 1"),
-                text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-            )
-        except Exception:
-            # Fallback: if JSON functions fail, filter in Python
-            all_activities = base_query.order_by(Activity.created_at.desc()).all()
-            filtered_activities = []
-            for activity in all_activities:
-                if activity.response_data:
-                    try:
-                        response_data = json.loads(activity.response_data)
-                        if response_data.get('exposed_confidential_data', False):
-                            filtered_activities.append(activity)
-                    except:
-                        pass
-            
-            # Get total count
-            total = len(filtered_activities)
-            
-            # Apply pagination
-            paginated_activities = filtered_activities[offset:offset + limit + 1]
-            
-            # Check if there are more records
-            has_more = len(paginated_activities) > limit
-            if has_more:
-                paginated_activities = paginated_activities[:limit]
-            
-            return ActivityListResponse(
-                activities=paginated_activities,
-                total=total,
-                has_more=has_more
-            )
+        base_query = SOURCE_FILTERS["exposed"](base_query)
     
-    # Get total count
-    total = base_query.count()
+    # Stream the page instead of materializing it when the client asks for NDJSON
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        return _stream_ndjson(base_query, limit, offset, cursor, include_bodies=not exclude_bodies)
     
     # Get paginated results
-    activities = base_query.order_by(Activity.created_at.desc()).offset(offset).limit(limit + 1).all()
-    
-    # Check if there are more records
-    has_more = len(activities) > limit
-    if has_more:
-        activities = activities[:limit]
+    activities, total, has_more, next_cursor = _paginate(
+        base_query, limit, offset, cursor, include_bodies=not exclude_bodies
+    )
     
     return ActivityListResponse(
         activities=activities,
         total=total,
-        has_more=has_more
+        has_more=has_more,
+        next_cursor=next_cursor
     )
 
 
 @router.delete("/api/activities", status_code=status.HTTP_200_OK)
 def flush_all_activities(
-    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Flush all activities across all projects (master token only)"""
     # Only allow master tokens
-    auth = get_auth_context(credentials, db)
     if not auth.is_master:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="This endpoint requires a master token"
         )
     
-    # Delete all activities
-    deleted_count = db.query(Activity).delete()
-    db.commit()
+    # Delete all activities (in batches to keep write locks short)
+    deleted_count = delete_activities_in_batches(db)
+    with _stats_cache_lock:
+        _stats_cache.clear()
     
     return {"deleted": deleted_count, "message": f"Flushed {deleted_count} activities"}
 
@@ -336,25 +466,21 @@ def flush_project_activities(
 ):
     """Flush all activities for a project - requires master token or project token (own project only)"""
     
-    # Delete all activities for this project
-    deleted_count = db.query(Activity).filter(
-        Activity.project_name == project.name
-    ).delete()
-    db.commit()
+    # Delete all activities for this project (in batches to keep write locks short)
+    deleted_count = delete_activities_in_batches(db, Activity.project_name == project.name)
+    with _stats_cache_lock:
+        _stats_cache.clear()
     
     return {"deleted": deleted_count, "message": f"Flushed {deleted_count} activities"}
 
 
 @router.get("/api/activities/stats")
 def get_activity_stats(
-    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db),
     project_name: Optional[str] = Query(None, description="Filter by project name (optional)")
 ):
     """Get activity statistics including exposed data counts - uses efficient SQL queries"""
-    # Check authentication
-    auth = get_auth_context(credentials, db)
-    
     # Get cutoff date (last 7 days)
     cutoff_date = datetime.utcnow() - timedelta(days=7)
     
@@ -365,8 +491,8 @@ def get_activity_stats(
     if project_name:
         if not auth.is_master:
             # Verify user has access to this project
-            project = db.query(Project).filter(Project.name == project_name).first()
-            if not project:
+            project_exists = db.query(Project.id).filter(Project.name == project_name).scalar() is not None
+            if not project_exists:
                 raise HTTPException(status_code=404, detail="Project not found")
             # For project tokens, verify they belong to this project
             # This is handled by the auth context - if they can call this endpoint, they have access
@@ -382,67 +508,36 @@ def get_activity_stats(
             "mcp_exposed_data_count": 0
         }
     
-    # Count total activities
-    total_activities = base_query.count()
+    cache_key = ("activity_stats", project_name or "", auth.is_master)
+    cached = _get_cached_stats(cache_key)
+    if cached is not None:
+        return cached
     
-    # Count MCP activities
-    mcp_activities = base_query.filter(Activity.method == 'MCP').count()
+    # Count total, MCP and exposed-data activities in one query
+    total_activities, mcp_activities, exposed_data_count, mcp_exposed_data_count = _count_activities(base_query)
     
-    # Count activities with exposed data using SQLite JSON functions
-    # SQLite 3.38+ supports json_extract() function
-    # We check if response_data contains "exposed_confidential_data": true
-    # json_extract returns 1 for true, NULL for missing/invalid JSON
-    # Use json_valid() to filter out malformed JSON first
-    try:
-        # Use json_valid() to ensure we only check valid JSON
-        # This prevents errors from malformed JSON in response_data
-        exposed_query = base_query.filter(
-            Activity.response_data.isnot(None),
-            text("json_valid(response_data) = 1"),
-            text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-        )
-        exposed_data_count = exposed_query.count()
-    except Exception:
-        # Fallback: if JSON functions fail, return 0
-        exposed_data_count = 0
-    
-    # Count MCP activities with exposed data
-    try:
-        mcp_exposed_query = base_query.filter(
-            Activity.method == 'MCP',
-            Activity.response_data.isnot(None),
-            text("json_valid(response_data) = 1"),
-            text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-        )
-        mcp_exposed_data_count = mcp_exposed_query.count()
-    except Exception:
-        # Fallback: if JSON functions fail, return 0
-        mcp_exposed_data_count = 0
-    
-    return {
+    return _cache_stats(cache_key, {
         "total_activities": total_activities,
         "mcp_activities": mcp_activities,
         "exposed_data_count": exposed_data_count,
         "mcp_exposed_data_count": mcp_exposed_data_count
-    }
+    })
 
 
 def extract_secret_key_from_path(path: str) -> Optional[str]:
     """Extract secret key from path like /projects/{project}/secrets/{key}"""
-    if '/secrets/' in path:
-        parts = path.split('/secrets/')
-        if len(parts) > 1:
-            secret_part = parts[1].split('/')[0].split('?')[0]  # Remove query params
-            return secret_part if secret_part else None
-    return None
+    _, sep, rest = path.partition('/secrets/')
+    if not sep:
+        return None
+    key = rest.split('/', 1)[0].split('?', 1)[0]  # Remove trailing segments and query params
+    return key or None
 
 def extract_secret_key_from_action(action: str, request_data: Optional[str]) -> Optional[str]:
     """Extract secret key from action and request data"""
     if action in ['get_secret', 'create_secret', 'delete_secret', 'check_secret_exists']:
         if request_data:
-            import json
             try:
-                data = json.loads(request_data)
+                data = _loads_json(request_data)
                 if isinstance(data, dict):
                     # Check body.key or key
                     body = data.get('body', {})
@@ -455,12 +550,11 @@ def extract_secret_key_from_action(action: str, request_data: Optional[str]) ->
 
 def extract_token_id_from_path(path: str) -> Optional[str]:
     """Extract token ID from path like /tokens/{id}"""
-    if '/tokens/' in path:
-        parts = path.split('/tokens/')
-        if len(parts) > 1:
-            token_part = parts[1].split('/')[0].split('?')[0]
-            return token_part if token_part else None
-    return None
+    _, sep, rest = path.partition('/tokens/')
+    if not sep:
+        return None
+    token_id = rest.split('/', 1)[0].split('?', 1)[0]  # Remove trailing segments and query params
+    return token_id or None
 
 def extract_mcp_tool_from_action(action: str) -> Optional[str]:
     """Extract MCP tool name from action like mcp_get_secret"""
@@ -470,102 +564,91 @@ def extract_mcp_tool_from_action(action: str) -> Optional[str]:
 
 def extract_device_id_from_path(path: str) -> Optional[str]:
     """Extract device ID from path"""
-    if '/devices/' in path:
-        parts = path.split('/devices/')
-        if len(parts) > 1:
-            device_part = parts[1].split('/')[0].split('?')[0]
-            return device_part if device_part else None
-    return None
+    _, sep, rest = path.partition('/devices/')
+    if not sep:
+        return None
+    device_id = rest.split('/', 1)[0].split('?', 1)[0]  # Remove trailing segments and query params
+    return device_id or None
+
+
+# Request sources recorded by the logging middleware (with their daily-stats labels),
+# and client_ip values that mean "not recorded"
+_REQUEST_SOURCE_LABELS = {'ui': 'UI', 'api': 'API', 'mcp': 'MCP'}
+_REQUEST_SOURCES = frozenset(_REQUEST_SOURCE_LABELS)
+_MISSING_CLIENT_IPS = frozenset(('', 'null', None))
+
+# Day bucket of an activity as a 'YYYY-MM-DD' string, matching the keys of the 7-day loop
+_DAY_EXPR = func.strftime('%Y-%m-%d', Activity.created_at)
+
+# Grouped daily rows are streamed in batches of this size instead of being materialised
+DAILY_STATS_YIELD_PER = 1000
+
+# Per-group response time sums for the grouped daily rows, rolled up in Python
+# (no second query per day and no window pass over the grouped result)
+_RESPONSE_TIME_COLUMNS = (
+    func.sum(Activity.execution_time_ms).label('time_sum'),
+    func.count(Activity.execution_time_ms).label('time_count'),
+)
+
+
+class _ResponseTimeTotals:
+    """Running response time totals over grouped rows carrying _RESPONSE_TIME_COLUMNS"""
+    
+    def __init__(self):
+        self.time_sum = 0
+        self.time_count = 0
+    
+    def add(self, row):
+        self.time_sum += row.time_sum or 0
+        self.time_count += row.time_count
+    
+    def average_ms(self) -> Optional[int]:
+        """Average response time in ms (None if no timed activity)"""
+        return round(self.time_sum / self.time_count) if self.time_count > 0 else None
+
+
+def _tally(daily_path_counts: dict, daily_counts: dict, date_key: str, key: str, count: int):
+    """Add a grouped row's count to its day's breakdown under key and to that day's total"""
+    date_counts = daily_path_counts.setdefault(date_key, {})
+    # Several grouped rows can map to the same display key (e.g. "/api" and "/api/" -> "/")
+    date_counts[key] = date_counts.get(key, 0) + count
+    daily_counts[date_key] = daily_counts.get(date_key, 0) + count
 
 
 @router.get("/api/dashboard/daily-stats")
 def get_daily_activity_stats(
-    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+    auth_project: Tuple[AuthContext, Optional[str]] = Depends(resolve_auth_project),
     db: Session = Depends(get_db),
     project_name: Optional[str] = Query(None, description="Filter by project name (optional)"),
     source: Optional[str] = Query(None, description="Filter by source: 'ui', 'api', or 'mcp'. Omit to show all.")
 ):
     """Get daily activity counts for the last 7 days with optional source filtering"""
-    from ...auth import get_auth_context
-    from sqlalchemy import case, text
-    
-    # Check authentication
-    auth = get_auth_context(credentials, db)
-    
     # Get cutoff date (last 7 days)
     cutoff_date = datetime.utcnow() - timedelta(days=7)
     
     # Build base query
-    if auth.is_master:
-        base_query = db.query(Activity).filter(Activity.created_at >= cutoff_date)
-        # Filter by project if provided
-        if project_name:
-            base_query = base_query.filter(Activity.project_name == project_name)
-    else:
+    _, project_scope = auth_project
+    if project_scope == "":
+        # Token not tied to an existing project - nothing to show
+        return {"daily_stats": [], "source": source, "avg_response_time_ms": None}
+    
+    base_query = db.query(Activity).filter(Activity.created_at >= cutoff_date)
+    if project_scope is not None:
         # For project tokens, only get activities for their project
-        # Get project name from token
-        if not auth.token or not auth.project_id:
-            return {"daily_stats": [], "source": source, "avg_response_time_ms": None}
-        
-        from ...models import Project
-        project = db.query(Project).filter(Project.id == auth.project_id).first()
-        if not project:
-            return {"daily_stats": [], "source": source, "avg_response_time_ms": None}
-        
-        # Filter activities for this project only
-        base_query = db.query(Activity).filter(
-            Activity.created_at >= cutoff_date,
-            Activity.project_name == project.name
-        )
+        base_query = base_query.filter(Activity.project_name == project_scope)
+    elif project_name:
+        # Master token: filter by project if provided
+        base_query = base_query.filter(Activity.project_name == project_name)
     
     # Use SQL aggregation for efficient counting (instead of loading all activities)
     # Apply filters at SQL level where possible
     # Initialize variables
     daily_path_counts = {}
-    avg_response_time_ms = None
+    response_times = _ResponseTimeTotals()
     
     # Apply source filters BEFORE grouping
-    if source == "root":
-        base_query = base_query.filter(Activity.project_name.is_(None))
-    elif source == "project":
-        base_query = base_query.filter(Activity.project_name.isnot(None))
-    elif source == "exposed":
-        # For exposed filter, check response_data JSON
-        base_query = base_query.filter(
-            Activity.response_data.isnot(None),
-            text("json_valid(response_data) = 1"),
-            text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-        )
-    elif source == "ip":
-        # IP filter: exclude UI events, only show API and MCP
-        base_query = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_valid(request_data) = 1"),
-            text("json_extract(request_data, '$.source') != 'ui' OR json_extract(request_data, '$.source') IS NULL")
-        )
-    elif source == "token":
-        # Token filter: only show activities with Bearer Authorization header
-        base_query = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_extract(request_data, '$.headers.authorization') LIKE 'Bearer %' OR json_extract(request_data, '$.headers.Authorization') LIKE 'Bearer %'")
-        )
-    elif source == "device":
-        # Device filter: only show activities with /devices/ in path
-        base_query = base_query.filter(Activity.path.like('%/devices/%'))
-    elif source == "ui":
-        # Filter by source='ui' using SQLite JSON functions
-        base_query = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_valid(request_data) = 1"),
-            text("json_extract(request_data, '$.source') = 'ui'")
-        )
-    elif source in ["api", "mcp"]:
-        # Filter by source using SQLite JSON functions
-        base_query = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_valid(request_data) = 1"),
-            text("json_extract(request_data, '$.source') = :source")
-        ).params(source=source)
+    if source in SOURCE_FILTERS:
+        base_query = SOURCE_FILTERS[source](base_query)
     
     # For UI, API, MCP, ROOT filters: group by path
     # For PROJECT filter: group by project_name
@@ -576,446 +659,215 @@ def get_daily_activity_stats(
     if source in ["ui", "api", "mcp", "root"]:
         # Group by date and path using SQL (get raw path, process in Python)
         path_query = base_query.with_entities(
-            func.date(Activity.created_at).label('date'),
+            _DAY_EXPR.label('date'),
             Activity.path,
-            func.count(Activity.id).label('count')
-        ).group_by(
-            func.date(Activity.created_at),
-            Activity.path
-        ).all()
-        
-        # Get daily totals and avg response time
-        daily_totals = base_query.with_entities(
-            func.date(Activity.created_at).label('date'),
             func.count(Activity.id).label('count'),
-            func.avg(Activity.execution_time_ms).label('avg_time')
+            *_RESPONSE_TIME_COLUMNS
         ).group_by(
-            func.date(Activity.created_at)
-        ).all()
+            _DAY_EXPR,
+            Activity.path
+        ).yield_per(DAILY_STATS_YIELD_PER)
         
         # Build dictionaries from SQL results
         daily_path_counts = {}
         daily_counts = {}
-        total_response_time = 0
-        response_time_count = 0
         
         for row in path_query:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
+            response_times.add(row)
+            date_key = row.date
             # Process path: remove /api prefix, handle empty paths
             path = row.path if row.path else ''
             if path.startswith('/api'):
                 path = path[4:]  # Remove /api prefix
             if not path:
                 path = '/'
-            if date_key not in daily_path_counts:
-                daily_path_counts[date_key] = {}
-            daily_path_counts[date_key][path] = row.count
+            _tally(daily_path_counts, daily_counts, date_key, path, row.count)
     elif source == "project":
         # Group by date and project_name using SQL
         path_query = base_query.with_entities(
-            func.date(Activity.created_at).label('date'),
+            _DAY_EXPR.label('date'),
             Activity.project_name,
-            func.count(Activity.id).label('count')
-        ).group_by(
-            func.date(Activity.created_at),
-            Activity.project_name
-        ).all()
-        
-        # Get daily totals and avg response time
-        daily_totals = base_query.with_entities(
-            func.date(Activity.created_at).label('date'),
             func.count(Activity.id).label('count'),
-            func.avg(Activity.execution_time_ms).label('avg_time')
+            *_RESPONSE_TIME_COLUMNS
         ).group_by(
-            func.date(Activity.created_at)
-        ).all()
+            _DAY_EXPR,
+            Activity.project_name
+        ).yield_per(DAILY_STATS_YIELD_PER)
         
         # Build dictionaries from SQL results (using project_name as key)
         daily_path_counts = {}
         daily_counts = {}
-        total_response_time = 0
-        response_time_count = 0
         
         for row in path_query:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
+            response_times.add(row)
+            date_key = row.date
             # Use project_name as the key (or "Global" if None)
             project_key = row.project_name if row.project_name else "Global"
-            if date_key not in daily_path_counts:
-                daily_path_counts[date_key] = {}
-            daily_path_counts[date_key][project_key] = row.count
+            _tally(daily_path_counts, daily_counts, date_key, project_key, row.count)
     elif source == "ip":
-        # Group by date, client_ip, and source using SQL (extract from request_data JSON)
-        # Exclude UI events - only show API and MCP
-        from sqlalchemy import cast, String
-        path_query = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_valid(request_data) = 1"),
-            text("json_extract(request_data, '$.source') != 'ui' OR json_extract(request_data, '$.source') IS NULL")
-        ).with_entities(
-            func.date(Activity.created_at).label('date'),
-            cast(text("COALESCE(json_extract(request_data, '$.client_ip'), 'unknown')"), String).label('client_ip'),
-            cast(text("COALESCE(json_extract(request_data, '$.source'), 'unknown')"), String).label('source'),
-            func.count(Activity.id).label('count')
-        ).group_by(
-            func.date(Activity.created_at),
-            text("COALESCE(json_extract(request_data, '$.client_ip'), 'unknown')"),
-            text("COALESCE(json_extract(request_data, '$.source'), 'unknown')")
-        ).all()
-        
-        # Get daily totals and avg response time (also exclude UI events)
-        daily_totals = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_valid(request_data) = 1"),
-            text("json_extract(request_data, '$.source') != 'ui' OR json_extract(request_data, '$.source') IS NULL")
-        ).with_entities(
-            func.date(Activity.created_at).label('date'),
+        # Group by date, client_ip, and source using SQL (generated columns from request_data)
+        # UI events are already excluded by SOURCE_FILTERS["ip"] - only API and MCP remain
+        path_query = base_query.with_entities(
+            _DAY_EXPR.label('date'),
+            func.coalesce(Activity.client_ip, 'unknown').label('client_ip'),
+            func.coalesce(Activity.request_source, 'unknown').label('source'),
             func.count(Activity.id).label('count'),
-            func.avg(Activity.execution_time_ms).label('avg_time')
+            *_RESPONSE_TIME_COLUMNS
         ).group_by(
-            func.date(Activity.created_at)
-        ).all()
+            _DAY_EXPR,
+            func.coalesce(Activity.client_ip, 'unknown'),
+            func.coalesce(Activity.request_source, 'unknown')
+        ).yield_per(DAILY_STATS_YIELD_PER)
         
         # Build dictionaries from SQL results (using "IP @ source" as key)
         daily_path_counts = {}
         daily_counts = {}
-        total_response_time = 0
-        response_time_count = 0
         
         for row in path_query:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
-            # Get client_ip and source
-            ip_key = getattr(row, 'client_ip', 'unknown')
-            source_key = getattr(row, 'source', 'unknown')
-            
-            if not ip_key or ip_key == 'null':
+            response_times.add(row)
+            date_key = row.date
+            source_label = _REQUEST_SOURCE_LABELS.get(row.source)
+            ip_key = row.client_ip
+            if ip_key in _MISSING_CLIENT_IPS:
                 ip_key = 'unknown'
-            if not source_key or source_key == 'null' or source_key not in ['ui', 'api', 'mcp']:
-                source_key = 'unknown'
-            
-            # Handle special case: MCP server sets client_ip to "MCP @ IP" format
-            # Extract the actual IP if it's in that format
-            if ip_key.startswith('MCP @ '):
-                ip_key = ip_key.replace('MCP @ ', '')
             elif ip_key == 'MCP':
                 # If it's just "MCP", use localhost as default
                 ip_key = '127.0.0.1'
+            else:
+                # Handle special case: MCP server sets client_ip to "MCP @ IP" format
+                ip_key = ip_key.removeprefix('MCP @ ')
             
             # Create combined key: "SOURCE @ IP" or just "IP" if source is unknown
-            if source_key == 'unknown':
-                combined_key = ip_key
-            else:
-                combined_key = f"{source_key.upper()} @ {ip_key}"
+            combined_key = ip_key if source_label is None else f"{source_label} @ {ip_key}"
             
-            if date_key not in daily_path_counts:
-                daily_path_counts[date_key] = {}
-            daily_path_counts[date_key][combined_key] = row.count
-        
-        for row in daily_totals:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
-            daily_counts[date_key] = row.count
-            if row.avg_time:
-                total_response_time += row.avg_time * row.count
-                response_time_count += row.count
-        
-        avg_response_time_ms = round(total_response_time / response_time_count) if response_time_count > 0 else None
+            _tally(daily_path_counts, daily_counts, date_key, combined_key, row.count)
     elif source == "token":
-        # Group by date and masked Bearer token from request_data using SQL aggregation
-        # Extract the masked token from Authorization header using SQLite JSON and string functions
-        from sqlalchemy import cast, String
-        
-        # Extract token from Authorization header: json_extract gets "Bearer TOKEN", then REPLACE removes "Bearer "
-        # Handle case-insensitive header lookup by checking both 'authorization' and 'Authorization'
-        path_query = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_extract(request_data, '$.headers.authorization') LIKE 'Bearer %' OR json_extract(request_data, '$.headers.Authorization') LIKE 'Bearer %'")
-        ).with_entities(
-            func.date(Activity.created_at).label('date'),
-            cast(
-                text("""
-                    COALESCE(
-                        REPLACE(json_extract(request_data, '$.headers.authorization'), 'Bearer ', ''),
-                        REPLACE(json_extract(request_data, '$.headers.Authorization'), 'Bearer ', ''),
-                        ''
-                    )
-                """),
-                String
-            ).label('token'),
-            func.count(Activity.id).label('count')
-        ).group_by(
-            func.date(Activity.created_at),
-            text("""
-                COALESCE(
-                    REPLACE(json_extract(request_data, '$.headers.authorization'), 'Bearer ', ''),
-                    REPLACE(json_extract(request_data, '$.headers.Authorization'), 'Bearer ', ''),
-                    ''
-                )
-            """)
-        ).all()
-        
-        # Get daily totals and avg response time (using SQL)
-        daily_totals = base_query.filter(
-            Activity.request_data.isnot(None),
-            text("json_extract(request_data, '$.headers.authorization') LIKE 'Bearer %' OR json_extract(request_data, '$.headers.Authorization') LIKE 'Bearer %'")
-        ).with_entities(
-            func.date(Activity.created_at).label('date'),
+        # Group by date and masked Bearer token using SQL aggregation
+        # (masked_token is generated by SQLite from the Authorization header in request_data;
+        # base_query is already restricted to Bearer requests by SOURCE_FILTERS["token"])
+        path_query = base_query.with_entities(
+            _DAY_EXPR.label('date'),
+            Activity.masked_token.label('token'),
             func.count(Activity.id).label('count'),
-            func.avg(Activity.execution_time_ms).label('avg_time')
+            *_RESPONSE_TIME_COLUMNS
         ).group_by(
-            func.date(Activity.created_at)
-        ).all()
+            _DAY_EXPR,
+            Activity.masked_token
+        ).yield_per(DAILY_STATS_YIELD_PER)
         
         # Build dictionaries from SQL results
         daily_path_counts = {}
         daily_counts = {}
-        total_response_time = 0
-        response_time_count = 0
         
         for row in path_query:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
+            response_times.add(row)
+            date_key = row.date
             token_key = getattr(row, 'token', '').strip()
             # Only process non-empty tokens
             if token_key:
-                if date_key not in daily_path_counts:
-                    daily_path_counts[date_key] = {}
-                daily_path_counts[date_key][token_key] = row.count
-        
-        # Process daily totals
-        for row in daily_totals:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
-            daily_counts[date_key] = row.count
-            if row.avg_time:
-                total_response_time += row.avg_time * row.count
-                response_time_count += row.count
-        
-        avg_response_time_ms = round(total_response_time / response_time_count) if response_time_count > 0 else None
+                _tally(daily_path_counts, daily_counts, date_key, token_key, row.count)
     elif source == "device":
         # Group by date and device ID using SQL aggregation
-        # Extract device ID from path like /projects/{project}/devices/{device_id} using SQL string functions
-        from sqlalchemy import cast, String
-        
-        # Extract device ID from path using SQL:
-        # Path format: /api/projects/{project}/devices/{device_id} or /projects/{project}/devices/{device_id}
-        # We need to extract the part after /devices/ and before the next / or end of string
-        # Use a simpler approach: extract substring after /devices/ up to next / or end
+        # (resource_id is the path segment after /devices/, generated by SQLite)
         path_query = base_query.filter(
-            Activity.path.like('%/devices/%')
-        ).with_entities(
-            func.date(Activity.created_at).label('date'),
-            cast(
-                text("""
-                    SUBSTR(
-                        path,
-                        INSTR(path, '/devices/') + 9,
-                        CASE 
-                            WHEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '/') > 0 
-                            THEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '/') - 1
-                            WHEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '?') > 0 
-                            THEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '?') - 1
-                            ELSE LENGTH(path) - INSTR(path, '/devices/') - 8
-                        END
-                    )
-                """),
-                String
-            ).label('device_id'),
-            func.count(Activity.id).label('count')
-        ).group_by(
-            func.date(Activity.created_at),
-            text("""
-                SUBSTR(
-                    path,
-                    INSTR(path, '/devices/') + 9,
-                    CASE 
-                        WHEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '/') > 0 
-                        THEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '/') - 1
-                        WHEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '?') > 0 
-                        THEN INSTR(SUBSTR(path, INSTR(path, '/devices/') + 9), '?') - 1
-                        ELSE LENGTH(path) - INSTR(path, '/devices/') - 8
-                    END
-                )
-            """)
-        ).having(
-            text("device_id IS NOT NULL AND device_id != ''")
-        ).all()
-        
-        # Get daily totals and avg response time (only for device-related paths)
-        daily_totals = base_query.filter(
-            Activity.path.like('%/devices/%')
+            Activity.resource_id.isnot(None)
         ).with_entities(
-            func.date(Activity.created_at).label('date'),
+            _DAY_EXPR.label('date'),
+            Activity.resource_id.label('device_id'),
             func.count(Activity.id).label('count'),
-            func.avg(Activity.execution_time_ms).label('avg_time')
+            *_RESPONSE_TIME_COLUMNS
         ).group_by(
-            func.date(Activity.created_at)
-        ).all()
+            _DAY_EXPR,
+            Activity.resource_id
+        ).yield_per(DAILY_STATS_YIELD_PER)
         
         # Build dictionaries from SQL results
         daily_path_counts = {}
         daily_counts = {}
-        total_response_time = 0
-        response_time_count = 0
         
         for row in path_query:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
+            response_times.add(row)
+            date_key = row.date
             device_id = getattr(row, 'device_id', '').strip()
             if device_id:
                 # Use device ID (show first 8 chars for readability)
                 device_key = f"Device {device_id[:8]}"
-                if date_key not in daily_path_counts:
-                    daily_path_counts[date_key] = {}
-                daily_path_counts[date_key][device_key] = row.count
-        
-        # Process daily totals
-        for row in daily_totals:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
-            daily_counts[date_key] = row.count
-            if row.avg_time:
-                total_response_time += row.avg_time * row.count
-                response_time_count += row.count
-        
-        avg_response_time_ms = round(total_response_time / response_time_count) if response_time_count > 0 else None
+                _tally(daily_path_counts, daily_counts, date_key, device_key, row.count)
     elif source == "exposed":
         # For EXPOSED filter: group by date and source (ui, api, mcp)
-        from sqlalchemy import cast, String
         path_query = base_query.with_entities(
-            func.date(Activity.created_at).label('date'),
-            cast(text("COALESCE(json_extract(request_data, '$.source'), 'unknown')"), String).label('source'),
-            func.count(Activity.id).label('count')
-        ).group_by(
-            func.date(Activity.created_at),
-            text("COALESCE(json_extract(request_data, '$.source'), 'unknown')")
-        ).all()
-        
-        # Get daily totals and avg response time
-        daily_totals = base_query.with_entities(
-            func.date(Activity.created_at).label('date'),
+            _DAY_EXPR.label('date'),
+            func.coalesce(Activity.request_source, 'unknown').label('source'),
             func.count(Activity.id).label('count'),
-            func.avg(Activity.execution_time_ms).label('avg_time')
+            *_RESPONSE_TIME_COLUMNS
         ).group_by(
-            func.date(Activity.created_at)
-        ).all()
+            _DAY_EXPR,
+            func.coalesce(Activity.request_source, 'unknown')
+        ).yield_per(DAILY_STATS_YIELD_PER)
         
         # Build dictionaries from SQL results (using source as key)
         daily_path_counts = {}
         daily_counts = {}
-        total_response_time = 0
-        response_time_count = 0
         
         for row in path_query:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
+            response_times.add(row)
+            date_key = row.date
             # Use source as the key (ui, api, mcp, unknown)
-            source_key = getattr(row, 'source', 'unknown')
-            if source_key not in ['ui', 'api', 'mcp']:
-                source_key = 'unknown'
-            if date_key not in daily_path_counts:
-                daily_path_counts[date_key] = {}
-            daily_path_counts[date_key][source_key] = row.count
-        
-        for row in daily_totals:
-            date_key = row.date.isoformat() if hasattr(row.date, 'isoformat') else str(row.date)
-            daily_counts[date_key] = row.count
-            if row.avg_time:
-                total_response_time += row.avg_time * row.count
-                response_time_count += row.count
-        
-        avg_response_time_ms = round(total_response_time / response_time_count) if response_time_count > 0 else None
+            source_key = row.source if row.source in _REQUEST_SOURCES else 'unknown'
+            _tally(daily_path_counts, daily_counts, date_key, source_key, row.count)
     else:
         # For "All" filter (no source filter), use SQL aggregation for daily counts
         # This handles the case when source is None or not in the special filter list
         daily_results = base_query.with_entities(
-            func.date(Activity.created_at).label('date'),
+            _DAY_EXPR.label('date'),
             func.count(Activity.id).label('count'),
-            func.avg(Activity.execution_time_ms).label('avg_time')
+            *_RESPONSE_TIME_COLUMNS
         ).group_by(
-            func.date(Activity.created_at)
-        ).all()
+            _DAY_EXPR
+        ).yield_per(DAILY_STATS_YIELD_PER)
         
         daily_counts = {}
-        total_response_time = 0
-        response_time_count = 0
         daily_path_counts = {}
         
         for row in daily_results:
-            # Convert date to string - handle both date objects and strings from SQLite
-            # SQLite func.date() returns a date object, but we need to ensure consistent formatting
-            if hasattr(row.date, 'isoformat'):
-                date_key = row.date.isoformat()
-            elif hasattr(row.date, 'strftime'):
-                date_key = row.date.strftime('%Y-%m-%d')
-            elif isinstance(row.date, str):
-                # If it's already a string, use it directly (but ensure format)
-                date_key = row.date[:10] if len(row.date) >= 10 else row.date
-            else:
-                # Fallback: convert to string and extract date part
-                date_str = str(row.date)
-                date_key = date_str[:10] if len(date_str) >= 10 else date_str
-            # Ensure date_key is exactly in YYYY-MM-DD format (10 characters)
-            if len(date_key) > 10:
-                date_key = date_key[:10]
-            daily_counts[date_key] = row.count
-            if row.avg_time:
-                total_response_time += row.avg_time * row.count
-                response_time_count += row.count
-        
-        avg_response_time_ms = round(total_response_time / response_time_count) if response_time_count > 0 else None
+            response_times.add(row)
+            daily_counts[row.date] = row.count
     
-    # Generate list for last 7 days
-    result = []
-    all_paths = set()
+    avg_response_time_ms = response_times.average_ms()
     
-    # Collect all unique paths/categories
-    if source in ["ui", "api", "mcp", "root", "token", "device", "exposed", "project", "ip"] and daily_path_counts:
-        # For UI/API/MCP/ROOT/TOKEN/DEVICE/EXPOSED/PROJECT/IP: collect paths/categories
-        for date_paths in daily_path_counts.values():
-            all_paths.update(date_paths.keys())
-    elif source == "project" and daily_path_counts:
-        # For PROJECT: collect project names
-        for date_paths in daily_path_counts.values():
-            all_paths.update(date_paths.keys())
-    elif source == "ip" and daily_path_counts:
-        # For IP: collect client IPs
-        for date_paths in daily_path_counts.values():
-            all_paths.update(date_paths.keys())
-    elif source == "exposed" and daily_path_counts:
-        # For EXPOSED: collect sources (ui, api, mcp)
-        for date_paths in daily_path_counts.values():
-            all_paths.update(date_paths.keys())
-        # Ensure we have all three sources even if count is 0
-        all_paths.update(["ui", "api", "mcp"])
-    elif source == "token" and daily_path_counts:
-        # For TOKEN: collect masked token values
-        for date_paths in daily_path_counts.values():
-            all_paths.update(date_paths.keys())
-    elif source == "device" and daily_path_counts:
-        # For DEVICE: collect device IDs
-        for date_paths in daily_path_counts.values():
-            all_paths.update(date_paths.keys())
-    all_paths = sorted(list(all_paths))  # Sort for consistent ordering
+    # Collect all unique paths/categories (paths, projects, IPs, tokens, devices or sources)
+    has_breakdown = source in ["ui", "api", "mcp", "root", "project", "ip", "token", "device", "exposed"]
+    all_paths = set()
+    if has_breakdown and daily_path_counts:
+        all_paths = set().union(*daily_path_counts.values())
+        if source == "exposed":
+            # Ensure we have all three sources even if count is 0
+            all_paths.update(["ui", "api", "mcp"])
+    all_paths = sorted(all_paths)  # Sort for consistent ordering
     
     # Debug: Print daily_counts for troubleshooting (remove in production)
     # print(f"DEBUG: daily_counts = {daily_counts}")
     # print(f"DEBUG: source = {source}")
     
+    # Generate list for last 7 days
+    result = []
+    today = datetime.utcnow().date()
     for i in range(6, -1, -1):  # Last 7 days, most recent last
-        date = (datetime.utcnow() - timedelta(days=i)).date()
+        date = today - timedelta(days=i)
         date_key = date.isoformat()
         
-        # Calculate total: if we have path breakdown, sum all paths; otherwise use daily_counts
-        total = daily_counts.get(date_key, 0)
-        if source in ["ui", "api", "mcp", "root", "project", "ip", "token", "device", "exposed"] and date_key in daily_path_counts:
-            # Sum all path/source/project/IP/token/device counts for this day
-            total = sum(daily_path_counts[date_key].values())
-        
+        # Per-day totals were tallied alongside the breakdown, so this is a plain lookup
         day_obj = {
             "date": date_key,
             "day": date.strftime("%a"),  # Mon, Tue, etc.
-            "total": total
+            "total": daily_counts.get(date_key, 0)
         }
         
         # Add path/source/project/IP/token/device breakdown
-        if source in ["ui", "api", "mcp", "root", "project", "ip", "token", "device", "exposed"] and date_key in daily_path_counts:
-            for path in all_paths:
-                day_obj[path] = daily_path_counts[date_key].get(path, 0)
         # For "All" (no filter), just use total - no path breakdown needed
+        date_paths = daily_path_counts.get(date_key) if has_breakdown else None
+        if date_paths is not None:
+            day_obj.update({path: date_paths.get(path, 0) for path in all_paths})
         
         result.append(day_obj)
     
@@ -1023,26 +875,26 @@ def get_daily_activity_stats(
         "daily_stats": result,
         "source": source,
         "avg_response_time_ms": avg_response_time_ms,
-        "paths": all_paths if source in ["ui", "api", "mcp", "root", "project", "ip", "token", "device", "exposed"] else []  # Return paths/sources/projects/IPs/tokens/devices for filters
+        "paths": all_paths if has_breakdown else []  # Return paths/sources/projects/IPs/tokens/devices for filters
     }
 
 
 @router.get("/api/dashboard/project-stats")
 def get_project_activity_stats(
-    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Get activity counts per project for the last 7 days"""
-    from ...auth import get_auth_context
-    
-    # Check authentication
-    auth = get_auth_context(credentials, db)
-    
     # Get cutoff date (last 7 days)
     cutoff_date = datetime.utcnow() - timedelta(days=7)
     
     # Build base query
     if auth.is_master:
+        cache_key = ("project_stats",)
+        cached = _get_cached_stats(cache_key)
+        if cached is not None:
+            return cached
+        
         # Use SQL aggregation to count activities per project
         project_counts_query = db.query(
             Activity.project_name.label('project_name'),
@@ -1070,7 +922,7 @@ def get_project_activity_stats(
         # Sort by total descending
         result.sort(key=lambda x: x["total"], reverse=True)
         
-        return {"project_stats": result}
+        return _cache_stats(cache_key, {"project_stats": result})
     else:
         # For project tokens, only get activities for their project
         return {"project_stats": []}
@@ -1078,140 +930,71 @@ def get_project_activity_stats(
 
 @router.get("/api/dashboard/stats")
 def get_dashboard_stats(
-    credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Get comprehensive dashboard statistics in a single request - uses efficient SQL queries"""
-    from ...models import Secret, Token, Device
-    
-    # Check authentication
-    auth = get_auth_context(credentials, db)
-    
     # Get cutoff date (last 7 days) for activities
     cutoff_date = datetime.utcnow() - timedelta(days=7)
     
+    if not auth.is_master and not auth.token:
+        raise HTTPException(status_code=403, detail="Invalid token")
+    
+    # Entity counts are always read fresh (projects, secrets, tokens and devices change
+    # without touching the activity log); only the 7-day activity aggregates are cached
     if auth.is_master:
         # Master token: get stats for all projects
-        projects_count = db.query(Project).count()
-        
-        # Count secrets across all projects
-        secrets_count = db.query(Secret).count()
-        
-        # Count tokens across all projects
-        tokens_count = db.query(Token).count()
-        
-        # Count authorized devices across all projects
-        authorized_devices_count = db.query(Device).filter(Device.status == 'authorized').count()
-        
-        # Activity stats (all activities)
-        base_activity_query = db.query(Activity).filter(Activity.created_at >= cutoff_date)
-        total_activities = base_activity_query.count()
-        mcp_activities = base_activity_query.filter(Activity.method == 'MCP').count()
-        
-        # Count exposed data
-        try:
-            exposed_data_count = base_activity_query.filter(
-                Activity.response_data.isnot(None),
-                text("json_valid(response_data) = 1"),
-                text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-            ).count()
-        except Exception:
-            exposed_data_count = 0
-        
-        # Count MCP exposed data
-        try:
-            mcp_exposed_data_count = base_activity_query.filter(
-                Activity.method == 'MCP',
-                Activity.response_data.isnot(None),
-                text("json_valid(response_data) = 1"),
-                text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-            ).count()
-        except Exception:
-            mcp_exposed_data_count = 0
-        
-        # Calculate average response time using SQL aggregation
-        result = db.query(func.avg(Activity.execution_time_ms)).filter(
-            Activity.created_at >= cutoff_date,
-            Activity.execution_time_ms.isnot(None)
-        ).scalar()
-        
-        avg_response_time = round(result) if result is not None else None
+        # (project, secret, token and authorized device counts in one round-trip)
+        projects_count, secrets_count, tokens_count, authorized_devices_count = db.query(
+            _count_subquery(Project),
+            _count_subquery(Secret),
+            _count_subquery(Token),
+            _count_subquery(Device, Device.status == 'authorized')
+        ).one()
         
+        # Activity stats cover all activities
+        activity_filters = ()
+    
     else:
         # Project token: get stats for the project this token belongs to
-        # Get project from token
-        from ...auth import hash_token
-        token_hash = hash_token(credentials.credentials)
-        project_token = db.query(Token).filter(Token.token_hash == token_hash).first()
-        
-        if not project_token:
-            raise HTTPException(status_code=403, detail="Invalid token")
-        
-        project = db.query(Project).filter(Project.id == project_token.project_id).first()
-        if not project:
+        # (the token row was already resolved by get_auth_context)
+        # Resolve the project name along with its secret, token and authorized device counts
+        project_id = auth.project_id
+        project_name, secrets_count, tokens_count, authorized_devices_count = db.query(
+            select(Project.name).where(Project.id == project_id).scalar_subquery(),
+            _count_subquery(Secret, Secret.project_id == project_id),
+            _count_subquery(Token, Token.project_id == project_id),
+            _count_subquery(Device, Device.project_id == project_id, Device.status == 'authorized')
+        ).one()
+        if project_name is None:
             raise HTTPException(status_code=404, detail="Project not found")
         
         projects_count = 1
         
-        # Count secrets for this project
-        secrets_count = db.query(Secret).filter(Secret.project_id == project.id).count()
-        
-        # Count tokens for this project
-        tokens_count = db.query(Token).filter(Token.project_id == project.id).count()
-        
-        # Count authorized devices for this project
-        authorized_devices_count = db.query(Device).filter(
-            Device.project_id == project.id,
-            Device.status == 'authorized'
-        ).count()
-        
-        # Activity stats (for this project)
-        base_activity_query = db.query(Activity).filter(
-            Activity.project_name == project.name,
-            Activity.created_at >= cutoff_date
-        )
-        total_activities = base_activity_query.count()
-        mcp_activities = base_activity_query.filter(Activity.method == 'MCP').count()
-        
-        # Count exposed data
-        try:
-            exposed_data_count = base_activity_query.filter(
-                Activity.response_data.isnot(None),
-                text("json_valid(response_data) = 1"),
-                text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-            ).count()
-        except Exception:
-            exposed_data_count = 0
-        
-        # Count MCP exposed data
-        try:
-            mcp_exposed_data_count = base_activity_query.filter(
-                Activity.method == 'MCP',
-                Activity.response_data.isnot(None),
-                text("json_valid(response_data) = 1"),
-                text("json_extract(response_data, '$.exposed_confidential_data') = 1")
-            ).count()
-        except Exception:
-            mcp_exposed_data_count = 0
-        
-        # Calculate average response time using SQL aggregation
-        result = db.query(func.avg(Activity.execution_time_ms)).filter(
-            Activity.project_name == project.name,
-            Activity.created_at >= cutoff_date,
-            Activity.execution_time_ms.isnot(None)
-        ).scalar()
-        
-        avg_response_time = round(result) if result is not None else None
+        # Activity stats cover this project only
+        activity_filters = (Activity.project_name == project_name,)
+    
+    cache_key = ("dashboard_activity_stats", None if auth.is_master else auth.project_id)
+    activity_stats = _get_cached_stats(cache_key)
+    if activity_stats is None:
+        # Activity stats and average response time in one scan
+        base_activity_query = db.query(Activity).filter(Activity.created_at >= cutoff_date, *activity_filters)
+        (
+            total_activities, mcp_activities, exposed_data_count, mcp_exposed_data_count, avg_response_time
+        ) = _count_activities(base_activity_query, include_avg_response_time=True)
+        activity_stats = _cache_stats(cache_key, {
+            "events_last_week": total_activities,
+            "mcp_activities": mcp_activities,
+            "exposed_data_count": exposed_data_count,
+            "mcp_exposed_data_count": mcp_exposed_data_count,
+            "avg_response_time_ms": avg_response_time
+        })
     
     return {
         "projects": projects_count,
         "secrets": secrets_count,
         "tokens": tokens_count,
         "authorized_devices": authorized_devices_count,
-        "events_last_week": total_activities,
-        "mcp_activities": mcp_activities,
-        "exposed_data_count": exposed_data_count,
-        "mcp_exposed_data_count": mcp_exposed_data_count,
-        "avg_response_time_ms": avg_response_time
+        **activity_stats
     }
 
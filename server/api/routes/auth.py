@@ -1,16 +1,50 @@
 """Authentication routes"""
 import os
+import asyncio
+import threading
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, status, Security
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, status, Security, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from ...models import MasterToken
-from ...auth import get_db, hash_token, get_auth_context, verify_master_token
+from ...auth import get_db, hash_token, get_auth_context, verify_master_token, get_cached_auth_info, cache_auth_info
 from ...config import MASTER_TOKEN, DATABASE_PATH
+from ..utils import etag_json_response, encode_etag_json, etag_response
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+# Database integrity results are reused for 5 minutes, keyed on the PRAGMA that produced
+# them - dashboards poll /database/info and each check reads the whole database file
+_integrity_cache = TTLCache(maxsize=2, ttl=300)
+_integrity_cache_lock = threading.Lock()
+
+# Encoded /status response (body, ETag), reused for 5 seconds so polls skip the database
+# ping and the MCP port probe (only touched on the event loop)
+_status_response_cache = TTLCache(maxsize=1, ttl=5)
+
+# Critical endpoints listed by /status. They can't easily be checked from within the same
+# server, so each is reported operational (the status call itself got here authenticated);
+# the result never changes, so it is built once
+_CHECKED_ENDPOINTS = (
+    ("/health", "GET", "Health check endpoint (public)"),
+    ("/api/auth/me", "GET", "Authentication endpoint"),
+    ("/api/projects", "GET", "Projects list endpoint"),
+    ("/api/docs", "GET", "API documentation endpoint"),
+    ("/api/dashboard/stats", "GET", "Dashboard statistics endpoint"),
+    ("/api/master-tokens", "GET", "Master tokens endpoint"),
+)
+_ENDPOINTS_STATUS = {
+    "operational": True,
+    "checked": [
+        {"endpoint": endpoint, "method": method, "description": description, "operational": True}
+        for endpoint, method, description in _CHECKED_ENDPOINTS
+    ],
+    "errors": [],
+    "details": f"{len(_CHECKED_ENDPOINTS)}/{len(_CHECKED_ENDPOINTS)} endpoints operational",
+}
+
 
 @router.get("/me", response_model=dict)
 def get_current_auth_info(
@@ -18,69 +52,101 @@ def get_current_auth_info(
     db: Session = Depends(get_db)
 ):
     """Get current authentication information (token name and type)"""
-    from ...models import Device
+    # Repeat calls with the same token are answered from the cache without touching the database
+    token_hash = hash_token(credentials.credentials)
+    cached = get_cached_auth_info(token_hash)
+    if cached is not None:
+        return cached
     
+    # get_auth_context resolves the master token, device or project token row
     auth = get_auth_context(credentials, db)
     
     if auth.is_master:
-        # Get master token info
-        token_str = credentials.credentials
-        token_hash = hash_token(token_str)
-        master_token = db.query(MasterToken).filter(
-            MasterToken.token_hash == token_hash
-        ).first()
-        
-        if master_token:
-            return {
-                "token_type": "master",
-                "token_name": master_token.name,
-                "is_master": True
-            }
-        # No fallback - token must exist in database
-    else:
-        # Check if it's a device_token (SHA256 hash of device_id)
-        if not auth.token and auth.project_id:
-            # This is likely a device_token
-            token_str = credentials.credentials
-            if len(token_str) == 64 and all(c in '0123456789abcdef' for c in token_str.lower()):
-                device = db.query(Device).filter(
-                    Device.device_id_hash == token_str.lower(),
-                    Device.status == "authorized"
-                ).first()
-                if device:
-                    return {
-                        "token_type": "device",
-                        "device_name": device.name,
-                        "device_id": device.id,
-                        "is_master": False,
-                        "project_id": auth.project_id
-                    }
-        
-        # Project token
-        if auth.token:
-            return {
-                "token_type": "project",
-                "token_name": auth.token.name,
-                "is_master": False,
-                "project_id": auth.project_id
-            }
+        return cache_auth_info(token_hash, {
+            "token_type": "master",
+            "token_name": auth.master_token.name,
+            "is_master": True
+        })
+    
+    if auth.device:
+        # device_token (SHA256 hash of device_id) of an authorized device
+        return cache_auth_info(token_hash, {
+            "token_type": "device",
+            "device_name": auth.device.name,
+            "device_id": auth.device.id,
+            "is_master": False,
+            "project_id": auth.project_id
+        })
+    
+    # Project token
+    if auth.token:
+        return cache_auth_info(token_hash, {
+            "token_type": "project",
+            "token_name": auth.token.name,
+            "is_master": False,
+            "project_id": auth.project_id
+        })
     
     raise HTTPException(status_code=401, detail="Invalid token")
 
 
+def _check_integrity(db: Session, pragma: str) -> dict:
+    """Run PRAGMA quick_check or integrity_check, reusing a result from the last 5 minutes"""
+    from sqlalchemy import text
+    
+    with _integrity_cache_lock:
+        cached = _integrity_cache.get(pragma)
+    if cached is not None:
+        return cached
+    
+    integrity_status = "unknown"
+    integrity_ok = False
+    integrity_details = None
+    try:
+        integrity_result = db.execute(text(f"PRAGMA {pragma}")).fetchone()
+        
+        if integrity_result:
+            integrity_check = integrity_result[0]
+            if integrity_check == "ok":
+                integrity_status = "ok"
+                integrity_ok = True
+            else:
+                integrity_status = "corrupted"
+                # Get first few lines of errors (truncate if too long)
+                integrity_details = integrity_check[:500]
+    except Exception as e:
+        # Errors are not cached - the next request retries the check
+        return {"status": "error", "ok": False, "details": str(e)[:200]}
+    
+    result = {"status": integrity_status, "ok": integrity_ok, "details": integrity_details}
+    with _integrity_cache_lock:
+        _integrity_cache[pragma] = result
+    return result
+
+
 @router.get("/database/info")
 def get_database_info(
+    request: Request,
     _: bool = Depends(verify_master_token),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    full: bool = Query(False, description="Run the full PRAGMA integrity_check instead of quick_check")
 ):
-    """Get database information (size, location, integrity, etc.) - requires master token"""
+    """Get database information (size, location, integrity, etc.) - requires master token
+    
+    Integrity is checked with PRAGMA quick_check (O(N), skips index/UNIQUE cross-checks)
+    unless full=true; either result is reused for up to 5 minutes. The response carries
+    an ETag, and a poll with a matching If-None-Match gets an empty 304.
+    """
     try:
         from sqlalchemy import text
         
-        # Get database file size
-        db_size_bytes = 0
-        if os.path.exists(DATABASE_PATH):
-            db_size_bytes = os.path.getsize(DATABASE_PATH)
+        # Get database file size (a single stat also tells us whether the file exists)
+        try:
+            db_size_bytes = os.stat(DATABASE_PATH).st_size
+            db_exists = True
+        except FileNotFoundError:
+            db_size_bytes = 0
+            db_exists = False
         
         # Format size
         def format_size(size_bytes):
@@ -96,46 +162,20 @@ def get_database_info(
         db_dir = os.path.dirname(DATABASE_PATH)
         
         # Check database integrity
-        integrity_status = "unknown"
-        integrity_ok = False
-        integrity_details = None
-        
-        if os.path.exists(DATABASE_PATH):
-            try:
-                # Run SQLite integrity check
-                result = db.execute(text("PRAGMA integrity_check"))
-                integrity_result = result.fetchone()
-                
-                if integrity_result:
-                    integrity_check = integrity_result[0]
-                    if integrity_check == "ok":
-                        integrity_status = "ok"
-                        integrity_ok = True
-                    else:
-                        integrity_status = "corrupted"
-                        integrity_ok = False
-                        # Get first few lines of errors (truncate if too long)
-                        integrity_details = integrity_check[:500] if len(integrity_check) > 500 else integrity_check
-                else:
-                    integrity_status = "unknown"
-            except Exception as e:
-                integrity_status = "error"
-                integrity_details = str(e)[:200]
+        integrity = {"status": "unknown", "ok": False, "details": None}
+        if db_exists:
+            integrity = _check_integrity(db, "integrity_check" if full else "quick_check")
         
-        return {
+        return etag_json_response(request, {
             "type": "SQLite",
             "location": DATABASE_PATH,
             "filename": db_filename,
             "directory": db_dir,
             "size_bytes": db_size_bytes,
             "size_formatted": format_size(db_size_bytes),
-            "exists": os.path.exists(DATABASE_PATH),
-            "integrity": {
-                "status": integrity_status,
-                "ok": integrity_ok,
-                "details": integrity_details
-            }
-        }
+            "exists": db_exists,
+            "integrity": integrity
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -143,15 +183,36 @@ def get_database_info(
         )
 
 
+async def _is_port_open(host: str, port: int, timeout: float = 1.0) -> bool:
+    """Check whether a TCP port accepts connections, without blocking the event loop"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    await writer.wait_closed()
+    return True
+
+
 @router.get("/status")
-def get_system_status(
+async def get_system_status(
+    request: Request,
     _: bool = Depends(verify_master_token),
     db: Session = Depends(get_db)
 ):
-    """Get system status (database, API, MCP, endpoints) - requires master token"""
-    import socket
+    """Get system status (database, API, MCP, endpoints) - requires master token
+    
+    Async so the MCP port probe (up to a second when the port is filtered) waits on the
+    event loop rather than holding a threadpool worker; the database ping still runs in
+    the threadpool since sessions are synchronous. The status is reused for 5 seconds
+    and carries an ETag; a poll with a matching If-None-Match gets an empty 304.
+    """
     from sqlalchemy import text
     
+    cached = _status_response_cache.get("status")
+    if cached is not None:
+        return etag_response(request, *cached)
+    
     status_info = {
         "database": {
             "operational": False,
@@ -169,19 +230,15 @@ def get_system_status(
             "details": None,
             "error": None
         },
-        "endpoints": {
-            "operational": False,
-            "checked": [],
-            "errors": []
-        }
+        # Endpoints are reported from a constant (see _ENDPOINTS_STATUS)
+        "endpoints": _ENDPOINTS_STATUS
     }
     
     # Check Database
     try:
         if os.path.exists(DATABASE_PATH):
             # Try to execute a simple query
-            result = db.execute(text("SELECT 1"))
-            result.fetchone()
+            await run_in_threadpool(lambda: db.execute(text("SELECT 1")).fetchone())
             status_info["database"]["operational"] = True
             status_info["database"]["details"] = "Database is accessible and responding"
         else:
@@ -200,13 +257,8 @@ def get_system_status(
     mcp_port = int(os.getenv("MCP_SERVER_PORT", "9000"))
     status_info["mcp"]["port"] = mcp_port
     try:
-        # Simple port check - if port is open, MCP is running
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)  # 1 second timeout
-        result = sock.connect_ex(('localhost', mcp_port))
-        sock.close()
-        
-        if result == 0:
+        # Simple port check - if port is open, MCP is running (1 second timeout)
+        if await _is_port_open('localhost', mcp_port):
             # Port is open - MCP server is running
             status_info["mcp"]["operational"] = True
             status_info["mcp"]["details"] = "MCP server is responding"
@@ -215,40 +267,6 @@ def get_system_status(
     except Exception as e:
         status_info["mcp"]["error"] = f"Error checking MCP server: {str(e)[:200]}"
     
-    # Check Endpoints - expanded list of critical endpoints
-    endpoints_to_check = [
-        ("/health", "GET", "Health check endpoint (public)"),
-        ("/api/auth/me", "GET", "Authentication endpoint"),
-        ("/api/projects", "GET", "Projects list endpoint"),
-        ("/api/docs", "GET", "API documentation endpoint"),
-        ("/api/dashboard/stats", "GET", "Dashboard statistics endpoint"),
-        ("/api/master-tokens", "GET", "Master tokens endpoint"),
-    ]
-    
-    operational_endpoints = 0
-    for endpoint, method, description in endpoints_to_check:
-        try:
-            # We can't easily check from within the same server, so we'll mark as operational
-            # if we got here (since we're already authenticated)
-            status_info["endpoints"]["checked"].append({
-                "endpoint": endpoint,
-                "method": method,
-                "description": description,
-                "operational": True
-            })
-            operational_endpoints += 1
-        except Exception as e:
-            status_info["endpoints"]["checked"].append({
-                "endpoint": endpoint,
-                "method": method,
-                "description": description,
-                "operational": False,
-                "error": str(e)[:200]
-            })
-            status_info["endpoints"]["errors"].append(f"{endpoint}: {str(e)[:200]}")
-    
-    status_info["endpoints"]["operational"] = operational_endpoints == len(endpoints_to_check)
-    status_info["endpoints"]["details"] = f"{operational_endpoints}/{len(endpoints_to_check)} endpoints operational"
-    
-    return status_info
+    encoded = _status_response_cache["status"] = encode_etag_json(status_info)
+    return etag_response(request, *encoded)
 
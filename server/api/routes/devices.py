@@ -1,20 +1,50 @@
 """Device management routes"""
-import json
+import orjson
+from functools import lru_cache
 from fastapi import APIRouter, Depends, HTTPException, status, Security, Query, Request
+from fastapi.responses import Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 
-from ...models import Project, Device, MasterToken
-from ...schemas import DeviceCreate, DeviceResponse
-from ...auth import get_db, hash_token, get_auth_context
-from ...device_id import get_device_id
-from ..utils import get_client_ip, detect_os_from_user_agent, get_project_by_name, commit_and_refresh
+from ...models import Project, Device
+from ...schemas import DeviceCreate, DeviceResponse, DeviceBulkAction
+from ...auth import get_db, hash_token, get_auth_context, clear_auth_caches, AuthContext
+from ...device_id import get_device_id, is_valid_device_id
+from ..utils import get_client_ip, detect_os_from_user_agent, get_project_by_name
 from ..dependencies import get_project_with_access, get_device_by_id, get_device_by_id_no_auth
 
 router = APIRouter(tags=["devices"])
 
+# Upper bound on the device IDs accepted by the bulk authorize/reject endpoints
+MAX_BULK_DEVICE_IDS = 500
+
+# Rows fetched per round trip when listing devices
+LIST_DEVICES_YIELD_PER = 200
+
+# Columns rendered by DeviceResponse (device_id_hash is the device's credential - never listed)
+_DEVICE_RESPONSE_COLUMNS = tuple(getattr(Device, field) for field in DeviceResponse.model_fields)
+
+
+@lru_cache(maxsize=1024)
+def _parse_auto_approval_patterns(tag_pattern: str) -> Tuple[str, ...]:
+    """Parse a project's auto_approval_tag_pattern into lowercased patterns.
+    
+    Accepts a JSON array, or a comma-separated / single value. Cached on the raw
+    setting, so editing the project's pattern takes effect immediately.
+    """
+    try:
+        # Try to parse as JSON array
+        patterns = orjson.loads(tag_pattern)
+        if not isinstance(patterns, list):
+            patterns = [tag_pattern]
+    except (orjson.JSONDecodeError, TypeError):
+        # If not JSON, treat as comma-separated or single value
+        patterns = [p.strip() for p in tag_pattern.split(',') if p.strip()]
+    # Empty entries are dropped (as in the comma-separated form) - "" would match every tag
+    return tuple(str(p).lower() for p in patterns if p)
+
 
 @router.post("/api/devices", response_model=DeviceResponse, status_code=status.HTTP_201_CREATED)
 def register_device(
@@ -58,21 +88,22 @@ def register_device(
             detail="device_id is required. Generate it client-side using hash(pwd) + hash(hostname) + MAC, then hash it to get device_token (SHA256) for authentication."
         )
     
-        # Use provided device ID (generated client-side with actual pwd/hostname/MAC)
-        device_id = device_data.device_id.lower().strip()
-        # Validate format (32 hex chars)
-        if len(device_id) != 32 or not all(c in '0123456789abcdef' for c in device_id):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid device_id format. Must be 32-character hex string."
-            )
+    # Use provided device ID (generated client-side with actual pwd/hostname/MAC)
+    device_id = device_data.device_id.lower().strip()
+    # Validate format (32 hex chars)
+    if not is_valid_device_id(device_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid device_id format. Must be 32-character hex string."
+        )
     
     # Hash the device_id to create device_token (for security)
     # Client will send device_token = SHA256(device_id) in Authorization header
     device_token = hash_token(device_id)  # SHA256 = 64 hex chars (stored as device_id_hash in DB)
     
     # Check if device already exists (by device_token, stored as device_id_hash in DB)
-    existing_device = db.query(Device).filter(
+    # Only the key columns are read here; the full row (with device_info) is loaded on a hit
+    existing_device = db.query(Device.id, Device.project_id).filter(
         Device.device_id_hash == device_token
     ).first()
     
@@ -84,8 +115,7 @@ def register_device(
                 detail="Device already registered for a different project"
             )
         # Device exists for this project - return it
-        db.refresh(existing_device)
-        return existing_device
+        return db.get(Device, existing_device.id)
     
     # Detect IP and OS from the request (server-side)
     detected_ip = get_client_ip(request)
@@ -105,29 +135,15 @@ def register_device(
     if device_data.description:
         device_info_dict["description"] = device_data.description
     
-    device_info_json = json.dumps(device_info_dict)
+    device_info_json = orjson.dumps(device_info_dict).decode()
     
     # Check auto-approval policy: if device has tags matching any pattern, auto-approve
     should_auto_approve = False
     if project.auto_approval_tag_pattern and device_data.tags:
-        try:
-            # Try to parse as JSON array
-            patterns = json.loads(project.auto_approval_tag_pattern)
-            if not isinstance(patterns, list):
-                patterns = [project.auto_approval_tag_pattern]
-        except (json.JSONDecodeError, TypeError):
-            # If not JSON, treat as comma-separated or single value
-            patterns = [p.strip() for p in project.auto_approval_tag_pattern.split(',') if p.strip()]
-        
+        patterns = _parse_auto_approval_patterns(project.auto_approval_tag_pattern)
         # Check if any device tag contains any pattern
-        for tag in device_data.tags:
-            tag_lower = tag.lower()
-            for pattern in patterns:
-                if pattern.lower() in tag_lower:
-                    should_auto_approve = True
-                    break
-            if should_auto_approve:
-                break
+        tags_lower = [tag.lower() for tag in device_data.tags]
+        should_auto_approve = any(pattern in tag for tag in tags_lower for pattern in patterns)
     
     if should_auto_approve:
         status_value = "authorized"
@@ -151,7 +167,10 @@ def register_device(
     )
     
     db.add(device)
-    device = commit_and_refresh(db, device)
+    # All columns are set client-side (id, timestamps, status), so keep them after the
+    # commit instead of reloading the row for the response
+    db.expire_on_commit = False
+    db.commit()
     
     # Device already knows its device_id (provided during registration)
     # Device can hash device_id locally to get device_token for authentication
@@ -159,14 +178,26 @@ def register_device(
     return device
 
 
-@router.get("/api/projects/{project_name}/devices", response_model=List[DeviceResponse])
+# The handler returns a pre-encoded Response, so the DeviceResponse list is documented
+# through responses= rather than declared as a response_model FastAPI would never apply
+@router.get(
+    "/api/projects/{project_name}/devices",
+    response_class=Response,
+    responses={
+        200: {
+            "model": List[DeviceResponse],
+            "content": {"application/json": {}},
+            "description": "Devices of the project, newest first",
+        }
+    },
+)
 def list_devices(
     project: Project = Depends(get_project_with_access),
     db: Session = Depends(get_db),
     status_filter: Optional[str] = Query(None, description="Filter by status: pending, authorized, rejected")
 ):
     """List devices for a project - requires master token (any project) or project token (own project only)"""
-    query = db.query(Device).filter(Device.project_id == project.id)
+    query = db.query(*_DEVICE_RESPONSE_COLUMNS).filter(Device.project_id == project.id)
     
     if status_filter:
         if status_filter not in ["pending", "authorized", "rejected"]:
@@ -176,8 +207,10 @@ def list_devices(
             )
         query = query.filter(Device.status == status_filter)
     
-    devices = query.order_by(Device.created_at.desc()).all()
-    return devices
+    # Rows are read as plain column tuples and encoded by orjson, skipping ORM objects and
+    # per-row DeviceResponse validation; the dict keys match DeviceResponse field for field
+    rows = query.order_by(Device.created_at.desc()).yield_per(LIST_DEVICES_YIELD_PER)
+    return Response(orjson.dumps([row._asdict() for row in rows]), media_type="application/json")
 
 
 @router.get("/api/projects/{project_name}/devices/{device_id}", response_model=DeviceResponse)
@@ -188,6 +221,82 @@ def get_device(
     return device
 
 
+def _authorized_by_name(auth: AuthContext) -> str:
+    """Token identifier recorded in Device.authorized_by"""
+    # (get_auth_context already resolved the master token row - no second lookup needed)
+    if auth.is_master:
+        return f"master_token:{auth.master_token.id}"
+    return f"project_token:{auth.token.id}" if auth.token else "project_token"
+
+
+def _check_bulk_device_ids(device_ids: List[str]):
+    """Reject bulk requests over MAX_BULK_DEVICE_IDS"""
+    if len(device_ids) > MAX_BULK_DEVICE_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_DEVICE_IDS} device IDs can be processed per request"
+        )
+
+
+# The bulk endpoints use a "devices:<action>" path rather than "devices/<action>", which the
+# resource_kind/resource_id activity columns would read as a device ID
+@router.post("/api/projects/{project_name}/devices:authorize")
+def authorize_devices(
+    body: DeviceBulkAction,
+    project: Project = Depends(get_project_with_access),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    """Authorize several devices of a project in one UPDATE - requires master token (any project) or project token (own project only)
+    
+    Already-authorized devices and IDs that do not belong to the project are skipped.
+    """
+    _check_bulk_device_ids(body.device_ids)
+    if not body.device_ids:
+        return {"authorized": 0, "message": "Authorized 0 devices"}
+    
+    now = datetime.utcnow()
+    authorized = db.query(Device).filter(
+        Device.project_id == project.id,
+        Device.id.in_(body.device_ids),
+        Device.status != "authorized"
+    ).update({
+        Device.status: "authorized",
+        Device.authorized_at: now,
+        Device.authorized_by: _authorized_by_name(auth),
+        Device.rejected_at: None,
+        Device.rejected_by: None,
+        Device.updated_at: now
+    }, synchronize_session=False)
+    db.commit()
+    
+    return {"authorized": authorized, "message": f"Authorized {authorized} devices"}
+
+
+@router.post("/api/projects/{project_name}/devices:reject")
+def reject_devices(
+    body: DeviceBulkAction,
+    project: Project = Depends(get_project_with_access),
+    db: Session = Depends(get_db)
+):
+    """Reject (hard delete) several devices of a project in one DELETE - requires master token (any project) or project token (own project only)
+    
+    IDs that do not belong to the project are skipped.
+    """
+    _check_bulk_device_ids(body.device_ids)
+    if not body.device_ids:
+        return {"rejected": 0, "message": "Rejected 0 devices"}
+    
+    rejected = db.query(Device).filter(
+        Device.project_id == project.id,
+        Device.id.in_(body.device_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+    clear_auth_caches()
+    
+    return {"rejected": rejected, "message": f"Rejected {rejected} devices"}
+
+
 @router.patch("/api/projects/{project_name}/devices/{device_id}/authorize", response_model=DeviceResponse)
 def authorize_device(
     device: Device = Depends(get_device_by_id),
@@ -197,29 +306,22 @@ def authorize_device(
     """Authorize a pending device - requires master token (any project) or project token (own project only)"""
     # If device is already authorized, return it as-is (idempotent)
     if device.status == "authorized":
-        db.refresh(device)
         return device
     
     # Get token info for authorized_by
     auth = get_auth_context(credentials, db)
-    token_str = credentials.credentials
-    
-    if auth.is_master:
-        master_token = db.query(MasterToken).filter(
-            MasterToken.token_hash == hash_token(token_str)
-        ).first()
-        authorized_by_name = f"master_token:{master_token.id}" if master_token else "master_token:env"
-    else:
-        authorized_by_name = f"project_token:{auth.token.id}" if auth.token else "project_token"
     
     device.status = "authorized"
     device.authorized_at = datetime.utcnow()
-    device.authorized_by = authorized_by_name
+    device.authorized_by = _authorized_by_name(auth)
     device.rejected_at = None
     device.rejected_by = None
     device.updated_at = datetime.utcnow()
+    # Every changed column was set here, so no reload is needed for the response
+    db.expire_on_commit = False
+    db.commit()
     
-    return commit_and_refresh(db, device)
+    return device
 
 
 @router.patch("/api/projects/{project_name}/devices/{device_id}/reject", status_code=status.HTTP_204_NO_CONTENT)
@@ -235,6 +337,7 @@ def reject_device(
     # Hard delete the device (activity will be logged by middleware)
     db.delete(device)
     db.commit()
+    clear_auth_caches()
     
     return None
 
@@ -247,5 +350,6 @@ def delete_device(
     """Delete a device - requires master token (any project) or project token (own project only)"""
     db.delete(device)
     db.commit()
+    clear_auth_caches()
     return None
 
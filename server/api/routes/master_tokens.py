@@ -3,11 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import timezone
 
 from ...models import MasterToken
 from ...schemas import MasterTokenCreate, MasterTokenResponse, MasterTokenInfo
-from ...auth import get_db, hash_token, verify_master_token
+from ...auth import get_db, hash_token, verify_master_token, clear_auth_caches
 from ..utils import mask_token, commit_and_refresh
 
 security = HTTPBearer()
@@ -30,9 +29,9 @@ def create_master_token(
     token_name = mask_token(token_str)
     
     # Check if this will be the first token (excluding the current one being used)
-    # If no tokens exist, mark as initial
-    existing_count = db.query(MasterToken).count()
-    is_init = 1 if existing_count == 0 else 0
+    # If no tokens exist, mark as initial - an EXISTS probe, no need to count them all
+    has_tokens = db.query(db.query(MasterToken).exists()).scalar()
+    is_init = 0 if has_tokens else 1
     
     db_master_token = MasterToken(
         name=token_name,
@@ -63,32 +62,28 @@ def list_master_tokens(
     current_token_str = credentials.credentials
     current_token_hash = hash_token(current_token_str)
     
-    # Return all tokens (if token exists, it's active)
-    tokens = db.query(MasterToken).all()
-    # Ensure timestamps are timezone-aware
-    result = []
-    for t in tokens:
-        # Ensure timestamps are UTC-aware
-        created_at = t.created_at
-        if created_at and created_at.tzinfo is None:
-            created_at = created_at.replace(tzinfo=timezone.utc)
-        
-        last_used = t.last_used
-        if last_used and last_used.tzinfo is None:
-            last_used = last_used.replace(tzinfo=timezone.utc)
-        
-        # Check if this is the current token
-        is_current = (t.token_hash == current_token_hash)
-        
-        result.append(MasterTokenInfo(
+    # Return all tokens (if token exists, it's active); the current-token check is a
+    # computed column, so only the listed columns are loaded (no token hashes)
+    tokens = db.query(
+        MasterToken.id,
+        MasterToken.name,
+        MasterToken.created_at,
+        MasterToken.last_used,
+        MasterToken.is_init_token,
+        (MasterToken.token_hash == current_token_hash).label("is_current_token")
+    ).all()
+    # Timestamps load as UTC-aware datetimes (UTCDateTime columns)
+    return [
+        MasterTokenInfo(
             id=t.id,
             name=t.name,
-            created_at=created_at,
-            last_used=last_used,
+            created_at=t.created_at,
+            last_used=t.last_used,
             is_init_token=bool(t.is_init_token),
-            is_current_token=is_current
-        ))
-    return result
+            is_current_token=bool(t.is_current_token)
+        )
+        for t in tokens
+    ]
 
 
 @router.delete("/{token_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -118,6 +113,7 @@ def revoke_master_token(
     # Hard delete - remove from database immediately
     db.delete(master_token)
     db.commit()
+    clear_auth_caches()
     return None
 
 
@@ -152,6 +148,8 @@ def rotate_master_token(
     )
     db.add(new_token)
     commit_and_refresh(db, new_token)
+    # The old token is gone - drop any cached verification of it
+    clear_auth_caches()
     
     # Return new token with the actual token string (only time it's shown)
     response = MasterTokenResponse(
@@ -6,7 +6,7 @@ from typing import List
 
 from ...models import Project
 from ...schemas import ProjectCreate, ProjectResponse, ProjectUpdate
-from ...auth import get_db, verify_master_token, get_auth_context
+from ...auth import get_db, verify_master_token, get_auth_context, clear_auth_caches
 from ..utils import get_project_by_name, commit_and_refresh
 from ..dependencies import get_project_with_access
 
@@ -93,5 +93,6 @@ def delete_project(
     # Delete from database (cascade will handle tokens and secrets)
     db.delete(project)
     db.commit()
+    clear_auth_caches()
     return None
 
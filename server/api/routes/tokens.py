@@ -6,7 +6,7 @@ from typing import List
 
 from ...models import Project, Token
 from ...schemas import TokenCreate, TokenResponse, TokenInfo
-from ...auth import get_db, hash_token
+from ...auth import get_db, hash_token, clear_auth_caches
 from ..utils import mask_token, commit_and_refresh
 from ..dependencies import get_project_with_access
 
@@ -72,5 +72,6 @@ def revoke_token(
     
     db.delete(token)
     db.commit()
+    clear_auth_caches()
     return None
 
@@ -1,14 +1,19 @@
 """Utility functions for API"""
 import re
+import hashlib
+import orjson
+from functools import lru_cache
 from fastapi import Request, HTTPException, status
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, Tuple
 
 from ..models import Project
 
 
+@lru_cache(maxsize=4096)
 def detect_os_from_user_agent(user_agent: str) -> str:
-    """Detect operating system from user agent string."""
+    """Detect operating system from user agent string (memoized - clients resend the same few agents)."""
     if not user_agent:
         return "Unknown"
     
@@ -117,3 +122,28 @@ def commit_and_refresh(db: Session, obj):
     db.commit()
     db.refresh(obj)
     return obj
+
+
+def encode_etag_json(content) -> Tuple[bytes, str]:
+    """Encode content as JSON and compute its ETag (blake2b of the body)"""
+    body = orjson.dumps(content)
+    return body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def etag_response(request: Request, body: bytes, etag: str) -> Response:
+    """
+    Return an already-encoded JSON body with its ETag, or an empty 304 Not Modified
+    when the request's If-None-Match already carries that ETag.
+    """
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+def etag_json_response(request: Request, content) -> Response:
+    """
+    Encode content as JSON with an ETag over the body.
+    Returns an empty 304 Not Modified when the request's If-None-Match already
+    carries that ETag (for endpoints that dashboards poll and that rarely change).
+    """
+    return etag_response(request, *encode_etag_json(content))
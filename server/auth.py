@@ -1,18 +1,38 @@
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from cachetools import TTLCache
+from typing import Optional
 import hashlib
+import re
+import threading
 
 from .models import SessionLocal, Token, MasterToken, Device
 
 security = HTTPBearer()
 
+# device_token = SHA256(device_id): 64 hex characters, in either case
+_DEVICE_TOKEN_RE = re.compile(r'[0-9a-fA-F]{64}')
+
+# Resolved /api/auth/me responses and verified master token hashes, keyed by token hash.
+# Only successful lookups are cached; revoking a token, deleting a project or removing a
+# device clears both caches so a revoked credential is not accepted or reported as valid.
+# Sync routes run in a threadpool, hence the lock.
+_auth_info_cache = TTLCache(maxsize=10000, ttl=30)
+_verified_master_tokens = TTLCache(maxsize=10000, ttl=30)
+_auth_cache_lock = threading.Lock()
+
 
 def hash_token(token: str) -> str:
     """Hash a token for storage"""
     return hashlib.sha256(token.encode()).hexdigest()
 
 
+def is_device_token(token_str: str) -> bool:
+    """Check whether a bearer token has the shape of a device_token (64 hex characters)"""
+    return _DEVICE_TOKEN_RE.fullmatch(token_str) is not None
+
+
 def get_db():
     """Dependency for database session"""
     db = SessionLocal()
@@ -26,11 +46,19 @@ def verify_master_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
     db: Session = Depends(get_db)
 ):
-    """Verify master token for administrative operations - only tokens in database are accepted"""
+    """Verify master token for administrative operations - only tokens in database are accepted
+    
+    A verified token is remembered for 30 seconds, so repeated admin calls skip the
+    lookup (and the last_used write) until it expires or a credential is revoked.
+    """
     token_str = credentials.credentials
     token_hash = hash_token(token_str)
     from datetime import datetime
     
+    with _auth_cache_lock:
+        if token_hash in _verified_master_tokens:
+            return True
+    
     # Check database for master token
     master_token = db.query(MasterToken).filter(
         MasterToken.token_hash == token_hash
@@ -40,18 +68,52 @@ def verify_master_token(
         # Update last_used timestamp
         master_token.last_used = datetime.utcnow()
         db.commit()
+        with _auth_cache_lock:
+            _verified_master_tokens[token_hash] = True
         return True
     
     # No fallback - token must exist in database
     raise HTTPException(status_code=403, detail="Master token required")
 
 
+def get_cached_auth_info(token_hash: str) -> Optional[dict]:
+    """Return the cached /api/auth/me response for a token hash, or None on a miss"""
+    with _auth_cache_lock:
+        return _auth_info_cache.get(token_hash)
+
+
+def cache_auth_info(token_hash: str, info: dict) -> dict:
+    """Cache the /api/auth/me response for a token hash and return it"""
+    with _auth_cache_lock:
+        _auth_info_cache[token_hash] = info
+    return info
+
+
+def clear_auth_caches():
+    """Drop all cached /api/auth/me responses and master token verifications (call after revoking any credential)"""
+    with _auth_cache_lock:
+        _auth_info_cache.clear()
+        _verified_master_tokens.clear()
+
+
 class AuthContext:
-    """Authentication context - can be master token or project token"""
-    def __init__(self, is_master: bool, project_id: str = None, token: Token = None):
+    """Authentication context - can be master token, project token or device token
+    
+    For a device token, device is a row with the device's id, name and project_id.
+    """
+    def __init__(
+        self,
+        is_master: bool,
+        project_id: str = None,
+        token: Token = None,
+        master_token: MasterToken = None,
+        device=None
+    ):
         self.is_master = is_master
         self.project_id = project_id
         self.token = token
+        self.master_token = master_token
+        self.device = device
 
 
 def get_auth_context(
@@ -71,20 +133,21 @@ def get_auth_context(
     if master_token:
         master_token.last_used = datetime.utcnow()
         db.commit()
-        return AuthContext(is_master=True, project_id=None)
+        return AuthContext(is_master=True, project_id=None, master_token=master_token)
     
     # Check if it's a device_token (64 hex characters - SHA256 hash of device_id)
     # Client sends: device_token = SHA256(device_id) in Authorization header
     # Server compares with stored device_id_hash (DB column name, but conceptually it's device_token)
-    if len(token_str) == 64 and all(c in '0123456789abcdef' for c in token_str.lower()):
-        device = db.query(Device).filter(
+    if is_device_token(token_str):
+        # Only the columns auth needs - device_info and the timestamps are not loaded
+        device = db.query(Device.id, Device.name, Device.project_id).filter(
             Device.device_id_hash == token_str.lower(),
             Device.status == "authorized"
         ).first()
         
         if device:
             # Device is authorized, grant access to its project
-            return AuthContext(is_master=False, project_id=device.project_id, token=None)
+            return AuthContext(is_master=False, project_id=device.project_id, token=None, device=device)
     
     # Otherwise, check if it's a project token
     token = db.query(Token).filter(Token.token_hash == token_hash).first()
@@ -127,8 +190,8 @@ def verify_project_access_by_id(
     # Check if it's a device_token (64 hex characters - SHA256 hash of device_id)
     # Client sends: device_token = SHA256(device_id) in Authorization header
     # Server compares with stored device_id_hash (DB column name, but conceptually it's device_token)
-    if len(token_str) == 64 and all(c in '0123456789abcdef' for c in token_str.lower()):
-        device = db.query(Device).filter(
+    if is_device_token(token_str):
+        device = db.query(Device.project_id).filter(
             Device.device_id_hash == token_str.lower(),
             Device.status == "authorized"
         ).first()
@@ -8,10 +8,20 @@ Works across Linux, macOS, Windows, and containers
 import hashlib
 import platform
 import os
+import re
 import socket
 import uuid
 
 
+# A device ID is 32 lowercase hex characters
+_DEVICE_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def is_valid_device_id(device_id: str) -> bool:
+    """Check that device_id is a 32-character lowercase hex string"""
+    return _DEVICE_ID_RE.fullmatch(device_id) is not None
+
+
 def hash_string(value: str) -> str:
     """Hash a string and return 32-character hex string"""
     if not value:
@@ -160,11 +170,8 @@ def get_device_id():
     if env_device_id:
         # Validate it's a valid hex string
         env_device_id = env_device_id.strip().lower()
-        try:
-            if len(env_device_id) == 32 and all(c in '0123456789abcdef' for c in env_device_id):
-                return env_device_id
-        except:
-            pass
+        if is_valid_device_id(env_device_id):
+            return env_device_id
     
     return generate_device_id()
 
@@ -5,7 +5,7 @@ import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .models import init_db, MasterToken
+from .models import init_db, optimize_db, MasterToken
 from .auth import hash_token
 from .activity_logger import cleanup_old_activities
 from .config import MASTER_TOKEN
@@ -58,6 +58,16 @@ def run_periodic_cleanup():
             print(f"Error in periodic cleanup: {e}")
 
 
+def run_periodic_optimize():
+    """Refresh SQLite query planner statistics every 4 hours"""
+    while True:
+        try:
+            time.sleep(4 * 3600)  # 4 hours
+            optimize_db()
+        except Exception as e:
+            print(f"Error in periodic optimize: {e}")
+
+
 def init_master_token():
     """Initialize master token from environment variable if database is newly created"""
     from .models import SessionLocal
@@ -108,6 +118,11 @@ def startup_event():
     # Start background thread for periodic cleanup
     cleanup_thread = threading.Thread(target=run_periodic_cleanup, daemon=True)
     cleanup_thread.start()
+    
+    # Gather planner statistics for the freshly migrated schema, then keep them current
+    optimize_db()
+    optimize_thread = threading.Thread(target=run_periodic_optimize, daemon=True)
+    optimize_thread.start()
 
 
 @app.get("/")
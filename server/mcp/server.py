@@ -418,9 +418,10 @@ def log_mcp_tool_invocation(
             token_type = "master"
         else:
             # Check if it's a device_token (64 hex characters - SHA256 hash of device_id)
-            if len(token) == 64 and all(c in '0123456789abcdef' for c in token.lower()):
+            from ..auth import is_device_token
+            if is_device_token(token):
                 from ..models import Device
-                device = db.query(Device).filter(
+                device = db.query(Device.project_id).filter(
                     Device.device_id_hash == token.lower(),  # DB column name, but conceptually it's device_token
                     Device.status == "authorized"
                 ).first()
@@ -1,7 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, LargeBinary, UniqueConstraint
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, ForeignKey, Text, LargeBinary, UniqueConstraint, Index, Boolean, Computed, TypeDecorator
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
-from datetime import datetime
+from datetime import datetime, timezone
 import secrets
 import string
 import uuid
@@ -10,7 +10,36 @@ from .config import DATABASE_PATH
 
 Base = declarative_base()
 
-engine = create_engine(f"sqlite:///{DATABASE_PATH}", connect_args={"check_same_thread": False})
+# Sync routes run concurrently in the threadpool, so keep enough pooled connections for
+# them; timeout is sqlite3's busy timeout (seconds) when another connection holds the write lock
+engine = create_engine(
+    f"sqlite:///{DATABASE_PATH}",
+    connect_args={"check_same_thread": False, "timeout": 5.0},
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+)
+
+# SQLite settings applied to every new connection. WAL lets readers run alongside the
+# writer (activity logging writes on every request); synchronous=NORMAL is durable in WAL mode.
+SQLITE_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",  # 64 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -25,6 +54,22 @@ def generate_id() -> str:
     return secrets.token_hex(8)  # 8 bytes = 16 hex characters
 
 
+class UTCDateTime(TypeDecorator):
+    """DateTime stored as naive UTC (SQLite keeps no offset) and loaded as timezone-aware UTC"""
+    impl = DateTime
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
 class Project(Base):
     __tablename__ = "projects"
     
@@ -45,8 +90,8 @@ class MasterToken(Base):
     id = Column(String(16), primary_key=True, index=True, default=generate_id)
     name = Column(String, nullable=False)
     token_hash = Column(String, nullable=False, unique=True, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_used = Column(DateTime, nullable=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    last_used = Column(UTCDateTime, nullable=True)
     is_init_token = Column(Integer, default=0)  # 1 = initialization token (from MASTER_TOKEN env), 0 = created via API
     
     @staticmethod
@@ -93,6 +138,46 @@ class Secret(Base):
     )
 
 
+# SQL expressions for Activity columns generated by SQLite from the JSON blobs.
+# They are VIRTUAL (computed on read, stored only in their indexes) because SQLite
+# can only add VIRTUAL generated columns to an existing table with ALTER TABLE.
+# json_valid() guards the rows whose blob is NULL or not valid JSON.
+# The logger always writes the flag as a json.dumps bool, so a substring match rules out
+# the (vast majority of) non-exposed rows before SQLite has to parse their JSON.
+EXPOSED_CONFIDENTIAL_DATA_SQL = (
+    "CASE WHEN response_data LIKE '%\"exposed_confidential_data\": true%' AND json_valid(response_data) "
+    "THEN COALESCE(json_extract(response_data, '$.exposed_confidential_data'), 0) = 1 "
+    "ELSE 0 END"
+)
+REQUEST_SOURCE_SQL = "CASE WHEN json_valid(request_data) THEN json_extract(request_data, '$.source') END"
+
+# Resource addressed by the request path: /secrets/{key}, /tokens/{id} or /devices/{id}
+_RESOURCE_PATH_MARKERS = (("/secrets/", "secret"), ("/tokens/", "token"), ("/devices/", "device"))
+
+
+def _path_segment_after_sql(marker: str) -> str:
+    """SQL for the path segment following marker, up to the next '/' (NULL if empty)"""
+    rest = f"substr(path, instr(path, '{marker}') + {len(marker)})"
+    return f"NULLIF(CASE WHEN instr({rest}, '/') > 0 THEN substr({rest}, 1, instr({rest}, '/') - 1) ELSE {rest} END, '')"
+
+
+RESOURCE_KIND_SQL = "CASE " + " ".join(
+    f"WHEN instr(path, '{marker}') > 0 THEN '{kind}'" for marker, kind in _RESOURCE_PATH_MARKERS
+) + " END"
+RESOURCE_ID_SQL = "CASE " + " ".join(
+    f"WHEN instr(path, '{marker}') > 0 THEN {_path_segment_after_sql(marker)}" for marker, _ in _RESOURCE_PATH_MARKERS
+) + " END"
+
+# Bearer token (already masked by the activity logger) from the Authorization header, either casing
+MASKED_TOKEN_SQL = "CASE " + " ".join(
+    f"WHEN json_extract(request_data, '$.headers.{header}') LIKE 'Bearer %' "
+    f"THEN NULLIF(REPLACE(json_extract(request_data, '$.headers.{header}'), 'Bearer ', ''), '')"
+    for header in ("authorization", "Authorization")
+) + " END"
+MASKED_TOKEN_SQL = f"CASE WHEN json_valid(request_data) THEN {MASKED_TOKEN_SQL} END"
+CLIENT_IP_SQL = "CASE WHEN json_valid(request_data) THEN json_extract(request_data, '$.client_ip') END"
+
+
 class Activity(Base):
     __tablename__ = "activities"
     
@@ -100,13 +185,70 @@ class Activity(Base):
     method = Column(String, nullable=False)  # GET, POST, DELETE, etc.
     path = Column(String, nullable=False)  # API path
     action = Column(String, nullable=False)  # e.g., "create_project", "get_secret", "delete_token"
-    project_name = Column(String, nullable=True, index=True)  # Project name if applicable
+    project_name = Column(String, nullable=True)  # Project name if applicable (indexed below)
     token_type = Column(String, nullable=False)  # "master" or "project"
     status_code = Column(Integer, nullable=False)
     execution_time_ms = Column(Integer, nullable=True)  # Execution time in milliseconds
     request_data = Column(Text, nullable=True)  # JSON string with all request data
     response_data = Column(Text, nullable=True)  # JSON string with all response data
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)  # Indexed below, together with id/project_name
+    # True when the response exposed confidential data (from response_data JSON)
+    exposed_confidential_data = Column(Boolean, Computed(EXPOSED_CONFIDENTIAL_DATA_SQL, persisted=False))
+    # Request source recorded by the logging middleware: "ui", "api" or "mcp" (from request_data JSON)
+    request_source = Column(String, Computed(REQUEST_SOURCE_SQL, persisted=False))
+    # "secret", "token" or "device" and its key/ID, when the path addresses one (from path)
+    resource_kind = Column(String, Computed(RESOURCE_KIND_SQL, persisted=False))
+    resource_id = Column(String, Computed(RESOURCE_ID_SQL, persisted=False))
+    # Masked bearer token the request was made with (from request_data headers)
+    masked_token = Column(String, Computed(MASKED_TOKEN_SQL, persisted=False))
+    # Client IP recorded by the logging middleware (from request_data JSON)
+    client_ip = Column(String, Computed(CLIENT_IP_SQL, persisted=False))
+
+
+# Keyset pagination indexes: activity lists are ordered by (created_at DESC, id DESC),
+# either globally or within a single project. They also serve every 7-day range scan
+# on created_at and every project_name lookup, so neither column has its own index.
+Index('ix_activities_created_at_id', Activity.created_at.desc(), Activity.id.desc())
+Index('ix_activities_project_created_at_id', Activity.project_name, Activity.created_at.desc(), Activity.id.desc())
+
+# Range scans over the 7-day window combined with the most common filters
+Index('ix_activities_source_created_at', Activity.request_source, Activity.created_at.desc())
+Index('ix_activities_resource_created_at', Activity.resource_kind, Activity.resource_id, Activity.created_at.desc())
+Index(
+    'ix_activities_masked_token_created_at',
+    Activity.masked_token,
+    Activity.created_at.desc(),
+    sqlite_where=Activity.masked_token.isnot(None)
+)
+
+# Per-project 7-day aggregates (GROUP BY project_name): a range per project, with the
+# method and response time read from the index
+Index(
+    'ix_activities_project_stats',
+    Activity.project_name,
+    Activity.created_at,
+    Activity.method,
+    Activity.execution_time_ms
+)
+
+# Partial index over the (rare) activities that exposed confidential data
+Index(
+    'ix_activities_exposed_created_at',
+    Activity.exposed_confidential_data,
+    Activity.created_at.desc(),
+    sqlite_where=Activity.exposed_confidential_data == True
+)
+
+
+# Indexes from earlier versions that init_db drops from existing databases
+OBSOLETE_ACTIVITY_INDEXES = (
+    'ix_activities_created_at',
+    'ix_activities_project_name',
+    'ix_activities_created_at_project',
+    'ix_activities_path',
+    'ix_activities_created_at_method',
+    'ix_activities_stats',
+)
 
 
 class Device(Base):
@@ -129,6 +271,10 @@ class Device(Base):
     project = relationship("Project", back_populates="devices")
 
 
+# A project's device list is ordered newest first
+Index('ix_devices_project_created_at', Device.project_id, Device.created_at.desc())
+
+
 def init_db():
     """Initialize the database"""
     # Enable auto-vacuum before creating tables (must be done on empty database)
@@ -136,6 +282,16 @@ def init_db():
     import os
     from sqlalchemy import text
     
+    # Activity filters and stats rely on SQLite's JSON functions - refuse to start without them
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT json_valid('{}')"))
+    except Exception as e:
+        raise RuntimeError(
+            "SQLite JSON functions (json_valid/json_extract) are not available. "
+            "Vaulty requires SQLite 3.38+ or a build with the JSON1 extension."
+        ) from e
+    
     db_exists = os.path.exists(DATABASE_PATH)
     if db_exists:
         # Check if database has any tables
@@ -146,11 +302,15 @@ def init_db():
             if not has_tables:
                 # Database exists but is empty, enable auto-vacuum
                 conn.execute(text("PRAGMA auto_vacuum = FULL"))
+                # The connect pragmas already switched the file to WAL, so it only takes effect on VACUUM
+                conn.execute(text("VACUUM"))
                 conn.commit()
     else:
         # New database, enable auto-vacuum before creating tables
         with engine.connect() as conn:
             conn.execute(text("PRAGMA auto_vacuum = FULL"))
+            # The connect pragmas already switched the file to WAL, so it only takes effect on VACUUM
+            conn.execute(text("VACUUM"))
             conn.commit()
     
     # Create all tables
@@ -212,4 +372,45 @@ def init_db():
         except Exception as e:
             # Table might not exist yet or migration already completed
             print(f"⚠️  Migration note: {e}")
+    
+    # Add generated activity columns missing from databases created before they existed
+    # (table_xinfo, unlike table_info, also lists generated columns)
+    with engine.connect() as conn:
+        activity_columns = [row[1] for row in conn.execute(text("PRAGMA table_xinfo(activities)")).fetchall()]
+        generated_columns = [
+            ("exposed_confidential_data", "BOOLEAN", EXPOSED_CONFIDENTIAL_DATA_SQL),
+            ("request_source", "VARCHAR", REQUEST_SOURCE_SQL),
+            ("resource_kind", "VARCHAR", RESOURCE_KIND_SQL),
+            ("resource_id", "VARCHAR", RESOURCE_ID_SQL),
+            ("masked_token", "VARCHAR", MASKED_TOKEN_SQL),
+            ("client_ip", "VARCHAR", CLIENT_IP_SQL),
+        ]
+        for name, column_type, expression in generated_columns:
+            if name not in activity_columns:
+                conn.execute(text(
+                    f"ALTER TABLE activities ADD COLUMN {name} {column_type} "
+                    f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+                ))
+                conn.commit()
+                print(f"✅ Added {name} column to activities table")
+    
+    # Drop activity indexes that earlier versions created but no query uses any more
+    # (every index slows down the activity INSERT on each logged request)
+    with engine.connect() as conn:
+        for index_name in OBSOLETE_ACTIVITY_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        conn.commit()
+    
+    # Create activity and device indexes added after the table was first created
+    # (create_all only creates indexes together with a new table)
+    for table in (Activity.__table__, Device.__table__):
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 
+def optimize_db():
+    """Run PRAGMA optimize so SQLite refreshes planner statistics for tables whose data changed"""
+    from sqlalchemy import text
+    
+    with engine.connect() as conn:
+        conn.execute(text("PRAGMA optimize"))
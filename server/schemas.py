@@ -116,6 +116,7 @@ class ActivityListResponse(BaseModel):
     activities: List[ActivityResponse]
     total: int
     has_more: bool
+    next_cursor: Optional[str] = None  # Opaque keyset cursor for the next page (None on the last page)
 
 
 class DeviceCreate(BaseModel):
@@ -134,6 +135,10 @@ class DeviceCreate(BaseModel):
     # Note: IP and OS are detected server-side from the request
 
 
+class DeviceBulkAction(BaseModel):
+    device_ids: List[str]  # 16-char hex device IDs (at most 500 per request)
+
+
 class DeviceResponse(BaseModel):
     id: str  # 16-char hex ID
     name: str
@@ -0,0 +1,74 @@
+"""Tests for the activity logging middleware"""
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault("MASTER_TOKEN", "test-master-token")
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "vaulty.db"))
+
+from server.api import middleware
+from server.api.middleware import ActivityLoggingMiddleware
+
+
+async def _noop_log_activity(*args, **kwargs):
+    pass
+
+
+async def _echo_body_app(scope, receive, send):
+    """Read the whole request body, like a route with a body parameter, and echo it back"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _server_receive(body: bytes):
+    """Receive channel that, like uvicorn, blocks once the body has been delivered"""
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+    return receive
+
+
+def _run(method: str, body: bytes, monkeypatch):
+    monkeypatch.setattr(middleware, "log_activity", _noop_log_activity)
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": "/api/projects",
+        "raw_path": b"/api/projects",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+        "scheme": "http",
+        "root_path": "",
+    }
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    app = ActivityLoggingMiddleware(_echo_body_app)
+    asyncio.run(asyncio.wait_for(app(scope, _server_receive(body), send), timeout=2))
+    return sent
+
+
+def test_empty_body_post_does_not_hang(monkeypatch):
+    sent = _run("POST", b"", monkeypatch)
+    assert sent[0]["status"] == 200
+    assert sent[1]["body"] == b""
+
+
+def test_body_is_replayed_to_the_app(monkeypatch):
+    sent = _run("PATCH", b'{"name": "p"}', monkeypatch)
+    assert sent[1]["body"] == b'{"name": "p"}'